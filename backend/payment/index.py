@@ -1,7 +1,7 @@
 import json
 import os
 import uuid
-import requests
+import http_client
 from datetime import datetime
 from wallet import get_or_create_wallet, add_balance, charge_balance, get_transactions
 
@@ -12,6 +12,9 @@ PLAN_PRICES = {
     'business': 4990
 }
 
+# Таймауты запросов к ЮKassa (подключение, чтение) в секундах
+YOOKASSA_TIMEOUT = (3.05, 15)
+
 def handler(event: dict, context) -> dict:
     """
     API для работы с платежами и кошельком
@@ -187,14 +190,16 @@ def handler(event: dict, context) -> dict:
                 }
             }
             
-            response = requests.post(
+            # Повтор безопасен: ЮKassa не создаст второй платёж с тем же Idempotence-Key
+            response = http_client.post(
                 'https://api.yookassa.ru/v3/payments',
                 json=payment_data,
                 auth=(shop_id, secret_key),
                 headers={
                     'Idempotence-Key': idempotence_key,
                     'Content-Type': 'application/json'
-                }
+                },
+                timeout=YOOKASSA_TIMEOUT
             )
             
             if response.status_code == 200:
@@ -234,9 +239,10 @@ def handler(event: dict, context) -> dict:
             }
         
         try:
-            response = requests.get(
+            response = http_client.get(
                 f'https://api.yookassa.ru/v3/payments/{payment_id}',
-                auth=(shop_id, secret_key)
+                auth=(shop_id, secret_key),
+                timeout=YOOKASSA_TIMEOUT
             )
             
             if response.status_code == 200:
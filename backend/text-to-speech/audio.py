@@ -0,0 +1,484 @@
+"""Модуль для склейки аудиофрагментов и расчёта длительности с учётом формата контейнера"""
+import struct
+import time
+import zlib
+
+# Параметры PCM, которые отдаёт SpeechKit для формата lpcm
+PCM_SAMPLE_WIDTH = 2
+PCM_CHANNELS = 1
+
+# Таблицы MPEG Audio Layer III
+MP3_BITRATES = {
+    'mpeg1': [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    'mpeg2': [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    0: [11025, 12000, 8000]
+}
+
+# Opus всегда считает granule position в отсчётах 48 кГц
+OPUS_GRANULE_RATE = 48000
+# Максимальный размер страницы Ogg
+OGG_MAX_PAGE_SIZE = 65307
+
+# Сколько кадров проверить, прежде чем считать MP3 потоком с постоянным битрейтом
+MP3_CBR_PROBES = 8
+
+# Пакет тишины Opus: CELT fullband 20 мс, моно
+OPUS_SILENCE_PACKET = b'\xf8\xff\xfe'
+OPUS_SILENCE_SAMPLES = 960
+# Больше 255 сегментов на странице Ogg не бывает
+OGG_MAX_SEGMENTS = 255
+
+OGG_HEADER_SIZE = 27
+OGG_GRANULE_UNSET = 0xFFFFFFFFFFFFFFFF
+OGG_FLAG_BOS = 0x02
+OGG_FLAG_EOS = 0x04
+
+# Ogg использует CRC-32 без отражения битов. zlib.crc32 считает отражённый вариант,
+# поэтому байты разворачиваются таблицей, а результат разворачивается обратно
+_BIT_REVERSE = bytes(int(f'{i:08b}'[::-1], 2) for i in range(256))
+
+
+def ogg_crc(*parts) -> int:
+    """Считает контрольную сумму страницы Ogg по её частям"""
+    crc = 0xFFFFFFFF
+    for part in parts:
+        crc = zlib.crc32(bytes(part).translate(_BIT_REVERSE), crc)
+    crc ^= 0xFFFFFFFF
+    return int(f'{crc:032b}'[::-1], 2)
+
+
+def parse_mp3_frame(mv, offset: int) -> dict:
+    """Разбирает заголовок кадра MP3 (Layer III); возвращает None, если кадра нет"""
+    if offset + 4 > len(mv):
+        return None
+
+    b1, b2, b3, b4 = mv[offset], mv[offset + 1], mv[offset + 2], mv[offset + 3]
+    if b1 != 0xFF or (b2 & 0xE0) != 0xE0:
+        return None
+
+    version = (b2 >> 3) & 0x03
+    layer = (b2 >> 1) & 0x03
+    bitrate_index = b3 >> 4
+    sample_rate_index = (b3 >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES['mpeg1' if mpeg1 else 'mpeg2'][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (b3 >> 1) & 0x01
+    mono = (b4 >> 6) == 3
+
+    if mpeg1:
+        length = 144 * bitrate // sample_rate + padding
+        side_info = 17 if mono else 32
+    else:
+        length = 72 * bitrate // sample_rate + padding
+        side_info = 9 if mono else 17
+
+    return {
+        'length': length,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'samples': 1152 if mpeg1 else 576,
+        'side_info': side_info
+    }
+
+
+def find_mp3_audio(mv) -> tuple:
+    """
+    Возвращает границы аудиокадров MP3 без служебных данных:
+    тегов ID3v2/ID3v1 и информационного кадра Xing/Info/VBRI.
+    """
+    start = 0
+    end = len(mv)
+
+    # ID3v2 в начале файла, размер записан в synchsafe-формате
+    while end - start >= 10 and bytes(mv[start:start + 3]) == b'ID3':
+        size = (mv[start + 6] << 21) | (mv[start + 7] << 14) | (mv[start + 8] << 7) | mv[start + 9]
+        footer = 10 if mv[start + 5] & 0x10 else 0
+        start += 10 + size + footer
+
+    if end - start >= 128 and bytes(mv[end - 128:end - 125]) == b'TAG':
+        end -= 128
+
+    # Пропускаем мусор до первого корректного кадра
+    while start < end - 4:
+        frame = parse_mp3_frame(mv, start)
+        if frame and (start + frame['length'] >= end or parse_mp3_frame(mv, start + frame['length'])):
+            break
+        start += 1
+    else:
+        return start, start
+
+    frame = parse_mp3_frame(mv, start)
+    xing_offset = start + 4 + frame['side_info']
+    tag = bytes(mv[xing_offset:xing_offset + 4])
+    if tag in (b'Xing', b'Info') or bytes(mv[start + 36:start + 40]) == b'VBRI':
+        start += frame['length']
+
+    return start, end
+
+
+def mp3_duration(mv, start: int = 0, end: int = None) -> float:
+    """
+    Длительность MP3 в секундах по заголовкам кадров, без декодирования.
+    Для постоянного битрейта хватает нескольких пробных кадров,
+    иначе заголовки перебираются кадр за кадром.
+    """
+    end = len(mv) if end is None else end
+    first = parse_mp3_frame(mv, start)
+    if not first:
+        return 0.0
+
+    size = end - start
+    average_length = first['samples'] / 8 * first['bitrate'] / first['sample_rate']
+    frame_count = size / average_length
+
+    # Из-за бита padding кадр может начинаться на байт раньше или позже расчётного
+    is_cbr = True
+    for probe in range(1, MP3_CBR_PROBES + 1):
+        position = start + int(int(frame_count * probe / (MP3_CBR_PROBES + 1)) * average_length)
+        for candidate in (position, position + 1, position - 1):
+            frame = parse_mp3_frame(mv, candidate)
+            if frame and frame['bitrate'] == first['bitrate'] and frame['sample_rate'] == first['sample_rate']:
+                break
+        else:
+            is_cbr = False
+            break
+
+    if is_cbr:
+        return round(frame_count) * first['samples'] / first['sample_rate']
+
+    samples = 0
+    offset = start
+    while offset < end:
+        frame = parse_mp3_frame(mv, offset)
+        if not frame:
+            break
+        samples += frame['samples']
+        offset += frame['length']
+
+    return samples / first['sample_rate']
+
+
+def opus_pre_skip(mv) -> int:
+    """Возвращает pre-skip из заголовка OpusHead первой страницы"""
+    if len(mv) < OGG_HEADER_SIZE + 1:
+        return 0
+    data_offset = OGG_HEADER_SIZE + mv[26]
+    if bytes(mv[data_offset:data_offset + 8]) != b'OpusHead':
+        return 0
+    return struct.unpack_from('<H', mv, data_offset + 10)[0]
+
+
+def ogg_duration(mv) -> float:
+    """Длительность Ogg Opus по granule position последней страницы"""
+    tail_start = max(0, len(mv) - OGG_MAX_PAGE_SIZE)
+    tail = bytes(mv[tail_start:])
+    position = tail.rfind(b'OggS')
+    while position >= 0:
+        if position + 14 <= len(tail):
+            granule = struct.unpack_from('<Q', tail, position + 6)[0]
+            if granule != OGG_GRANULE_UNSET:
+                return max(0, granule - opus_pre_skip(mv)) / OPUS_GRANULE_RATE
+        position = tail.rfind(b'OggS', 0, position)
+    return 0.0
+
+
+def pcm_duration(data_size: int, sample_rate: int) -> float:
+    """Длительность PCM по размеру данных"""
+    return data_size / (sample_rate * PCM_CHANNELS * PCM_SAMPLE_WIDTH)
+
+
+def get_audio_duration(format_type: str, data: bytes, sample_rate: int) -> float:
+    """Возвращает точную длительность готового аудио в секундах"""
+    mv = memoryview(data)
+    if format_type == 'wav':
+        start, end = find_wav_data(mv)
+        return pcm_duration(end - start, sample_rate)
+    if format_type == 'ogg':
+        return ogg_duration(mv)
+    start, end = find_mp3_audio(mv)
+    return mp3_duration(mv, start, end)
+
+
+def iter_ogg_pages(mv):
+    """Перебирает страницы Ogg: (offset, header_type, granule, data_offset, page_end, lacing)"""
+    offset = 0
+    total = len(mv)
+    while offset + OGG_HEADER_SIZE <= total:
+        if bytes(mv[offset:offset + 4]) != b'OggS':
+            raise ValueError('Некорректный поток Ogg')
+
+        header_type = mv[offset + 5]
+        granule = struct.unpack_from('<Q', mv, offset + 6)[0]
+        segments = mv[offset + 26]
+        lacing = mv[offset + OGG_HEADER_SIZE:offset + OGG_HEADER_SIZE + segments]
+        data_offset = offset + OGG_HEADER_SIZE + segments
+        page_end = data_offset + sum(lacing)
+        if page_end > total:
+            raise ValueError('Обрезанная страница Ogg')
+
+        yield offset, header_type, granule, data_offset, page_end, lacing
+        offset = page_end
+
+
+def build_wav_header(data_size: int, sample_rate: int, channels: int = PCM_CHANNELS,
+                     sample_width: int = PCM_SAMPLE_WIDTH) -> bytes:
+    """Возвращает 44-байтный заголовок RIFF/WAVE для PCM-данных"""
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b'data', data_size
+    )
+
+
+def find_wav_data(mv) -> tuple:
+    """Возвращает границы PCM-данных; для сырого PCM — весь буфер"""
+    if len(mv) < 12 or bytes(mv[0:4]) != b'RIFF' or bytes(mv[8:12]) != b'WAVE':
+        return 0, len(mv)
+
+    offset = 12
+    while offset + 8 <= len(mv):
+        chunk_id = bytes(mv[offset:offset + 4])
+        chunk_size = struct.unpack_from('<I', mv, offset + 4)[0]
+        if chunk_id == b'data':
+            return offset + 8, min(offset + 8 + chunk_size, len(mv))
+        offset += 8 + chunk_size + (chunk_size & 1)
+
+    return len(mv), len(mv)
+
+
+class Mp3Stitcher:
+    """Склейка MP3: кадры идут подряд, теги и информационные кадры отбрасываются"""
+
+    needs_header = False
+
+    def __init__(self):
+        self.duration = 0.0
+        self._frame_header = None
+
+    def feed(self, chunk: bytes) -> list:
+        mv = memoryview(chunk)
+        start, end = find_mp3_audio(mv)
+        self.duration += mp3_duration(mv, start, end)
+        if end - start >= 4:
+            # Шаблон для кадров тишины: без CRC и без байта padding
+            header = bytearray(mv[start:start + 4])
+            header[1] |= 0x01
+            header[2] &= ~0x02
+            self._frame_header = bytes(header)
+        return [mv[start:end]]
+
+    def silence(self, seconds: float) -> list:
+        """Кадры с нулевой side info декодируются в тишину с параметрами предыдущего фрагмента"""
+        if self._frame_header is None or seconds <= 0:
+            return []
+        frame = parse_mp3_frame(self._frame_header, 0)
+        count = round(seconds * frame['sample_rate'] / frame['samples'])
+        self.duration += count * frame['samples'] / frame['sample_rate']
+        return [(self._frame_header + bytes(frame['length'] - 4)) * count]
+
+    def finish(self) -> list:
+        return []
+
+    def header(self, data_size: int) -> bytes:
+        return b''
+
+
+class WavStitcher:
+    """Склейка PCM: данные всех фрагментов под одним заголовком RIFF правильного размера"""
+
+    needs_header = True
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.data_size = 0
+
+    @property
+    def duration(self) -> float:
+        return pcm_duration(self.data_size, self.sample_rate)
+
+    def feed(self, chunk: bytes) -> list:
+        mv = memoryview(chunk)
+        start, end = find_wav_data(mv)
+        self.data_size += end - start
+        return [mv[start:end]]
+
+    def silence(self, seconds: float) -> list:
+        size = int(seconds * self.sample_rate) * PCM_CHANNELS * PCM_SAMPLE_WIDTH
+        if size <= 0:
+            return []
+        self.data_size += size
+        return [bytes(size)]
+
+    def finish(self) -> list:
+        return []
+
+    def header(self, data_size: int) -> bytes:
+        return build_wav_header(data_size, self.sample_rate)
+
+
+class OggOpusStitcher:
+    """
+    Склейка Ogg Opus в один логический поток: заголовки OpusHead/OpusTags
+    берутся из первого фрагмента, страницы остальных получают общий serial,
+    сквозную нумерацию и сдвинутые granule position.
+    """
+
+    needs_header = False
+
+    def __init__(self):
+        self.serial = None
+        self.sequence = 0
+        self.granule_offset = 0
+        self.pre_skip = 0
+        self._pending = None
+
+    @property
+    def duration(self) -> float:
+        return max(0, self.granule_offset - self.pre_skip) / OPUS_GRANULE_RATE
+
+    def feed(self, chunk: bytes) -> list:
+        mv = memoryview(chunk)
+        output = self._flush_pending(last=False)
+        first_chunk = self.serial is None
+        packets_done = 0
+        last_granule = 0
+
+        for offset, header_type, granule, data_offset, page_end, lacing in iter_ogg_pages(mv):
+            if first_chunk and self.serial is None:
+                self.serial = struct.unpack_from('<I', mv, offset + 14)[0]
+                self.pre_skip = opus_pre_skip(mv)
+
+            # OpusHead и OpusTags нужны только из первого фрагмента
+            if packets_done < 2:
+                packets_done += sum(1 for value in lacing if value < 255)
+                if not first_chunk:
+                    continue
+            elif granule != OGG_GRANULE_UNSET:
+                last_granule = granule
+                granule += self.granule_offset
+
+            output.extend(self._flush_pending(last=False))
+            self._pending = (header_type, granule, mv[offset + 26:data_offset], mv[data_offset:page_end])
+
+        self.granule_offset += last_granule
+        # Последняя страница фрагмента ждёт следующего, чтобы знать, ставить ли EOS
+        return output
+
+    def silence(self, seconds: float) -> list:
+        """Страницы из пакетов тишины Opus по 20 мс с продолжением granule position"""
+        if self.serial is None:
+            return []
+        output = []
+        remaining = round(seconds * OPUS_GRANULE_RATE / OPUS_SILENCE_SAMPLES)
+        while remaining > 0:
+            count = min(remaining, OGG_MAX_SEGMENTS)
+            remaining -= count
+            self.granule_offset += count * OPUS_SILENCE_SAMPLES
+            output.extend(self._flush_pending(last=False))
+            segment_table = bytes([count]) + bytes([len(OPUS_SILENCE_PACKET)]) * count
+            self._pending = (0, self.granule_offset, segment_table, OPUS_SILENCE_PACKET * count)
+        return output
+
+    def finish(self) -> list:
+        return self._flush_pending(last=True)
+
+    def header(self, data_size: int) -> bytes:
+        return b''
+
+    def _flush_pending(self, last: bool) -> list:
+        if self._pending is None:
+            return []
+
+        header_type, granule, segment_table, data = self._pending
+        self._pending = None
+
+        flags = header_type & ~(OGG_FLAG_BOS | OGG_FLAG_EOS)
+        if self.sequence == 0:
+            flags |= OGG_FLAG_BOS
+        if last:
+            flags |= OGG_FLAG_EOS
+
+        header = bytearray(struct.pack('<4sBBQIII', b'OggS', 0, flags, granule, self.serial, self.sequence, 0))
+        header += segment_table
+        struct.pack_into('<I', header, 22, ogg_crc(header, data))
+        self.sequence += 1
+        return [bytes(header), data]
+
+
+def get_stitcher(format_type: str, sample_rate: int):
+    """Возвращает склейщик для формата файла"""
+    if format_type == 'wav':
+        return WavStitcher(sample_rate)
+    if format_type == 'ogg':
+        return OggOpusStitcher()
+    return Mp3Stitcher()
+
+
+def stitch_audio(format_type: str, chunks: list, sample_rate: int) -> bytes:
+    """Склеивает фрагменты целиком в памяти"""
+    stitcher = get_stitcher(format_type, sample_rate)
+    pieces = []
+    for chunk in chunks:
+        pieces.extend(stitcher.feed(chunk))
+    pieces.extend(stitcher.finish())
+    data_size = sum(len(piece) for piece in pieces)
+    return stitcher.header(data_size) + b''.join(pieces)
+
+
+def _benchmark_ogg(seconds: float) -> bytes:
+    """Поток Ogg Opus из тишины: страницы OpusHead, OpusTags и пакеты по 20 мс"""
+    def page(flags: int, sequence: int, packet: bytes) -> bytes:
+        header = bytearray(struct.pack('<4sBBQIII', b'OggS', 0, flags, 0, 1, sequence, 0))
+        header += bytes([1, len(packet)])
+        struct.pack_into('<I', header, 22, ogg_crc(header, packet))
+        return bytes(header) + packet
+
+    opus_head = b'OpusHead' + struct.pack('<BBHIhB', 1, PCM_CHANNELS, 312, OPUS_GRANULE_RATE, 0, 0)
+    opus_tags = b'OpusTags' + struct.pack('<I', 0) + struct.pack('<I', 0)
+    stitcher = OggOpusStitcher()
+    pieces = stitcher.feed(page(OGG_FLAG_BOS, 0, opus_head) + page(0, 1, opus_tags))
+    pieces += stitcher.silence(seconds)
+    pieces += stitcher.finish()
+    return b''.join(pieces)
+
+
+def benchmark(seconds: float = 600, sample_rate: int = 48000, repeats: int = 20):
+    """Замеряет get_audio_duration на десятиминутном аудио каждого формата: python audio.py"""
+    # Кадры MPEG-1 Layer III 48 кГц: 128 и 160 кбит/с
+    mp3_frames = [
+        header + bytes(parse_mp3_frame(header, 0)['length'] - 4)
+        for header in (b'\xff\xfb\x94\xc4', b'\xff\xfb\xa4\xc4')
+    ]
+    frame_count = int(seconds * 48000 / 1152)
+    pcm_size = int(seconds * sample_rate) * PCM_CHANNELS * PCM_SAMPLE_WIDTH
+
+    samples = [
+        ('mp3', 'mp3 CBR', mp3_frames[0] * frame_count),
+        # Битрейт чередуется: переменный битрейт перебирается кадр за кадром
+        ('mp3', 'mp3 VBR', b''.join(mp3_frames[index % 2] for index in range(frame_count))),
+        ('wav', 'wav', build_wav_header(pcm_size, sample_rate) + bytes(pcm_size)),
+        ('ogg', 'ogg', _benchmark_ogg(seconds))
+    ]
+
+    for format_type, name, data in samples:
+        best = None
+        for _ in range(repeats):
+            started = time.perf_counter()
+            duration = get_audio_duration(format_type, data, sample_rate)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f'{name:>8}: {best * 1000:8.3f} мс, {len(data) / 1e6:6.1f} МБ, длительность {duration:.1f} с')
+
+
+if __name__ == '__main__':
+    benchmark()
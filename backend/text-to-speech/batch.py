@@ -0,0 +1,99 @@
+"""Модуль для пакетного синтеза множества коротких текстов за один вызов"""
+import os
+from parallel import ordered_map
+from speechkit import SpeechKitError
+from circuit_breaker import CircuitOpenError
+from synthesis import synthesize_text, resolve_voice, voice_lang, ConfigurationError
+
+# Максимум элементов в одном пакете
+BATCH_MAX_ITEMS = 200
+
+# Пакет пользователя вмещает столько максимальных запросов его тарифа;
+# анонимный пакет не длиннее одного обычного запроса
+BATCH_REQUESTS_PER_PLAN = 4
+
+# Сколько текстов пакета синтезируется одновременно
+DEFAULT_BATCH_WORKERS = 4
+
+
+def get_batch_workers() -> int:
+    """Возвращает число одновременно синтезируемых текстов из TTS_BATCH_WORKERS"""
+    try:
+        return max(1, int(os.environ.get('TTS_BATCH_WORKERS', DEFAULT_BATCH_WORKERS)))
+    except ValueError:
+        return DEFAULT_BATCH_WORKERS
+
+
+def batch_max_chars(max_chars: int, registered: bool) -> int:
+    """Предел символов на весь пакет: синхронный вызов должен уложиться в таймаут функции"""
+    return max_chars * BATCH_REQUESTS_PER_PLAN if registered else max_chars
+
+
+def parse_batch_items(raw_items: list, max_chars: int) -> tuple:
+    """
+    Приводит элементы пакета к единому виду.
+    Возвращает (items, errors): items — валидные элементы с индексом,
+    errors — {index: текст ошибки} для отклонённых.
+    """
+    items = []
+    errors = {}
+
+    for index, raw in enumerate(raw_items):
+        if not isinstance(raw, dict):
+            errors[index] = 'Элемент пакета должен быть объектом'
+            continue
+
+        text = str(raw.get('text') or '').strip()
+        if not text:
+            errors[index] = 'Текст не может быть пустым'
+            continue
+        if len(text) > max_chars:
+            errors[index] = f'Текст слишком длинный (максимум {max_chars} символов)'
+            continue
+
+        voice_input = raw.get('voice', 'alena')
+        items.append({
+            'index': index,
+            'text': text,
+            'voice': resolve_voice(voice_input),
+            'lang': voice_lang(voice_input),
+            'speed': raw.get('speed', 1.0),
+            'format': raw.get('format', 'mp3')
+        })
+
+    return items, errors
+
+
+def synthesize_item(item: dict) -> dict:
+    """Синтезирует один элемент пакета; ошибка не прерывает остальные"""
+    try:
+        result = synthesize_text(item['text'], item['voice'], item['speed'], item['format'], lang=item['lang'])
+    except CircuitOpenError as e:
+        return {'index': item['index'], 'status': 503, 'error': str(e), 'retry_after': e.retry_after}
+    except ConfigurationError as e:
+        return {'index': item['index'], 'status': 500, 'error': str(e)}
+    except SpeechKitError as e:
+        return {'index': item['index'], 'status': e.status_code, 'error': f'Ошибка Yandex API: {e.message}'}
+    except Exception as e:
+        print(f'Batch item {item["index"]} error: {e}')
+        return {'index': item['index'], 'status': 500, 'error': f'Внутренняя ошибка: {str(e)}'}
+
+    return {
+        'index': item['index'],
+        'status': 200,
+        'audio_url': result['audio_url'],
+        'audio_duration': result['audio_duration'],
+        'format': item['format'],
+        'voice': item['voice'],
+        'character_count': len(item['text']),
+        'cached': result['cached']
+    }
+
+
+def synthesize_batch(items: list, max_workers: int = None) -> list:
+    """
+    Синтезирует элементы пакета параллельно. Кэш, соединения с БД,
+    клиент S3 и HTTP-сессия общие для всех элементов.
+    Возвращает результаты в исходном порядке.
+    """
+    return ordered_map(synthesize_item, items, max_workers or get_batch_workers())
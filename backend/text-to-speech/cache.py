@@ -0,0 +1,127 @@
+"""Модуль для кэширования результатов синтеза речи"""
+import hashlib
+import json
+import re
+import unicodedata
+from psycopg2.extras import execute_values
+from db import get_pooled_connection, release_connection
+from lru import LRUCache
+
+# Размер кэша в памяти тёплого экземпляра функции
+LRU_MAX_SIZE = 512
+
+_synthesis_lru = LRUCache(LRU_MAX_SIZE)
+
+
+def normalize_text(text: str) -> str:
+    """Приводит текст к каноническому виду: NFC и схлопнутые пробелы"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def synthesis_cache_key(text: str, voice: str, speed, audio_format: str, sample_rate: str, lang: str = None) -> str:
+    """
+    Возвращает ключ кэша для набора параметров синтеза.
+    Язык входит в ключ вместе с голосом: один голос на разных языках звучит по-разному.
+    """
+    voice_key = voice + (f':{lang}' if lang else '')
+    payload = json.dumps(
+        [normalize_text(text), voice_key, f'{float(speed):g}', audio_format, str(sample_rate)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_cached_synthesis(cache_key: str) -> dict:
+    """Ищет готовый синтез сначала в памяти, затем в БД"""
+    cached = _synthesis_lru.get(cache_key)
+    if cached:
+        return cached
+
+    conn = get_pooled_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            UPDATE tts_cache
+            SET hits = hits + 1, last_hit_at = NOW()
+            WHERE cache_key = %s
+            RETURNING audio_url, audio_duration
+        """, (cache_key,))
+
+        row = cur.fetchone()
+        conn.commit()
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    if not row:
+        return None
+
+    cached = {'audio_url': row[0], 'audio_duration': row[1]}
+    _synthesis_lru.put(cache_key, cached)
+    return cached
+
+
+def store_cached_synthesis(cache_key: str, audio_url: str, voice: str, speed, audio_format: str,
+                           character_count: int, audio_duration: int):
+    """Сохраняет результат синтеза в кэш"""
+    conn = get_pooled_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            INSERT INTO tts_cache (cache_key, audio_url, voice, speed, format, character_count, audio_duration)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (cache_key) DO NOTHING
+        """, (cache_key, audio_url, voice, speed, audio_format, character_count, audio_duration))
+        conn.commit()
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    _synthesis_lru.put(cache_key, {'audio_url': audio_url, 'audio_duration': audio_duration})
+
+
+def find_cached_segments(segment_keys: list) -> dict:
+    """Возвращает {segment_key: s3_key} для уже синтезированных фрагментов"""
+    if not segment_keys:
+        return {}
+
+    conn = get_pooled_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            UPDATE tts_segments
+            SET hits = hits + 1
+            WHERE segment_key = ANY(%s)
+            RETURNING segment_key, s3_key
+        """, (list(set(segment_keys)),))
+
+        rows = cur.fetchall()
+        conn.commit()
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    return {row[0].strip(): row[1] for row in rows}
+
+
+def store_cached_segments(segments: list):
+    """Сохраняет новые фрагменты: список кортежей (segment_key, s3_key, byte_size)"""
+    if not segments:
+        return
+
+    conn = get_pooled_connection()
+    cur = conn.cursor()
+
+    try:
+        execute_values(cur, """
+            INSERT INTO tts_segments (segment_key, s3_key, byte_size)
+            VALUES %s
+            ON CONFLICT (segment_key) DO NOTHING
+        """, segments)
+        conn.commit()
+    finally:
+        cur.close()
+        release_connection(conn)
@@ -0,0 +1,216 @@
+"""Модуль автоматического выключателя для внешних API: быстрый отказ, пока API деградирует"""
+import threading
+import time
+from collections import deque
+from db import get_pooled_connection, release_connection
+
+# Окно, по которому считается доля неудачных вызовов, и минимум вызовов в нём
+WINDOW_SECONDS = 60
+MIN_CALLS = 8
+FAILURE_RATE_THRESHOLD = 0.5
+
+# Вызов дольше этого считается неудачным: API отвечает, но слишком медленно.
+# Порог у каждого API свой: пачка Translate на 9000 символов идёт дольше фрагмента SpeechKit
+SLOW_CALL_SECONDS = {
+    'speechkit': 5.0,
+    'translate': 15.0
+}
+DEFAULT_SLOW_CALL_SECONDS = 5.0
+
+# Сколько выключатель остаётся разомкнутым до пробного вызова
+OPEN_SECONDS = 30
+# Если пробный вызов не отчитался за это время, пробу может взять другой экземпляр
+PROBE_TIMEOUT_SECONDS = 20
+PROBE_RETRY_AFTER = 5
+
+# Как долго экземпляр доверяет прочитанному из БД состоянию
+STATE_TTL = 1.0
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+_lock = threading.Lock()
+_windows = {}
+_states = {}
+
+
+class CircuitOpenError(Exception):
+    """Выключатель разомкнут: вызов не выполняется"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f'Сервис {name} временно недоступен, повторите через {retry_after:.0f} с')
+        self.name = name
+        self.retry_after = max(1, int(round(retry_after)))
+
+
+def _execute(sql: str, params: tuple) -> tuple:
+    conn = get_pooled_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        conn.commit()
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    return row
+
+
+def _get_state(name: str) -> tuple:
+    """Возвращает (state, секунд до пробы) с кэшированием в памяти на STATE_TTL"""
+    now = time.monotonic()
+    with _lock:
+        cached = _states.get(name)
+        if cached and cached[2] > now:
+            return cached[0], cached[1] - now
+
+    row = _execute("""
+        SELECT state, GREATEST(0, EXTRACT(EPOCH FROM opened_until - NOW()::timestamp))
+        FROM circuit_breakers
+        WHERE name = %s
+    """, (name,))
+    state = row[0] if row else STATE_CLOSED
+    remaining = float(row[1] or 0) if row else 0.0
+
+    with _lock:
+        _states[name] = (state, now + remaining, now + STATE_TTL)
+    return state, remaining
+
+
+def _set_local_state(name: str, state: str, remaining: float = 0.0):
+    now = time.monotonic()
+    with _lock:
+        _states[name] = (state, now + remaining, now + STATE_TTL)
+        if state != STATE_CLOSED:
+            _windows.pop(name, None)
+
+
+def _trip(name: str):
+    """Размыкает выключатель для всех экземпляров"""
+    _execute("""
+        UPDATE circuit_breakers
+        SET state = 'open', opened_until = NOW()::timestamp + %s * INTERVAL '1 second',
+            probe_started_at = NULL, updated_at = NOW()
+        WHERE name = %s
+        RETURNING name
+    """, (OPEN_SECONDS, name))
+    _set_local_state(name, STATE_OPEN, OPEN_SECONDS)
+    print(f'Circuit {name} opened')
+
+
+def _close(name: str):
+    _execute("""
+        UPDATE circuit_breakers
+        SET state = 'closed', opened_until = NULL, probe_started_at = NULL, updated_at = NOW()
+        WHERE name = %s
+        RETURNING name
+    """, (name,))
+    _set_local_state(name, STATE_CLOSED)
+    print(f'Circuit {name} closed')
+
+
+def _claim_probe(name: str) -> bool:
+    """Только один экземпляр получает право на пробный вызов"""
+    row = _execute("""
+        UPDATE circuit_breakers
+        SET state = 'half_open', probe_started_at = NOW(), updated_at = NOW()
+        WHERE name = %s
+          AND ((state = 'open' AND opened_until <= NOW()::timestamp)
+               OR (state = 'half_open' AND probe_started_at < NOW()::timestamp - %s * INTERVAL '1 second'))
+        RETURNING name
+    """, (name, PROBE_TIMEOUT_SECONDS))
+    return row is not None
+
+
+def is_open(name: str) -> bool:
+    """Разомкнут ли выключатель и пауза до пробы ещё не истекла"""
+    try:
+        state, remaining = _get_state(name)
+    except Exception as db_error:
+        print(f'Circuit breaker error: {db_error}')
+        return False
+    return state == STATE_OPEN and remaining > 0
+
+
+def check(name: str):
+    """
+    Бросает CircuitOpenError, пока выключатель разомкнут, не занимая пробу.
+    Вызывается до ожидания токена rate_limit, чтобы отказ был быстрым.
+    """
+    try:
+        state, remaining = _get_state(name)
+    except Exception as db_error:
+        print(f'Circuit breaker error: {db_error}')
+        return
+    if state == STATE_OPEN and remaining > 0:
+        raise CircuitOpenError(name, remaining)
+
+
+def before_call(name: str) -> bool:
+    """
+    Проверяет выключатель перед вызовом. Бросает CircuitOpenError, если вызывать нельзя;
+    возвращает True, если этот вызов — пробный после паузы.
+    Если БД недоступна, выключатель считается замкнутым.
+    """
+    try:
+        state, remaining = _get_state(name)
+        if state == STATE_CLOSED:
+            return False
+        if state == STATE_OPEN and remaining > 0:
+            raise CircuitOpenError(name, remaining)
+        if _claim_probe(name):
+            return True
+    except CircuitOpenError:
+        raise
+    except Exception as db_error:
+        print(f'Circuit breaker error: {db_error}')
+        return False
+
+    raise CircuitOpenError(name, PROBE_RETRY_AFTER)
+
+
+def record(name: str, success: bool, probe: bool = False):
+    """Учитывает исход вызова; при превышении порога размыкает выключатель"""
+    try:
+        if probe:
+            if success:
+                _close(name)
+            else:
+                _trip(name)
+            return
+
+        now = time.monotonic()
+        with _lock:
+            window = _windows.setdefault(name, deque())
+            window.append((now, success))
+            while window and window[0][0] < now - WINDOW_SECONDS:
+                window.popleft()
+            calls = len(window)
+            failures = sum(1 for _, ok in window if not ok)
+
+        if calls >= MIN_CALLS and failures / calls >= FAILURE_RATE_THRESHOLD:
+            _trip(name)
+    except Exception as db_error:
+        print(f'Circuit breaker error: {db_error}')
+
+
+def call(name: str, func, is_failure=None):
+    """
+    Выполняет func под защитой выключателя. Исключение, ответ, признанный
+    is_failure(result) неудачным, и вызов дольше порога SLOW_CALL_SECONDS этого API считаются отказом.
+    """
+    slow_seconds = SLOW_CALL_SECONDS.get(name, DEFAULT_SLOW_CALL_SECONDS)
+    probe = before_call(name)
+    started = time.monotonic()
+    try:
+        result = func()
+    except Exception:
+        record(name, False, probe)
+        raise
+
+    failed = (is_failure is not None and is_failure(result)) or time.monotonic() - started > slow_seconds
+    record(name, not failed, probe)
+    return result
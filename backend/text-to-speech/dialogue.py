@@ -0,0 +1,134 @@
+"""Модуль для озвучки диалогов: у каждой реплики свой голос и скорость"""
+import json
+from audio import get_stitcher
+from cache import synthesis_cache_key, store_cached_synthesis
+from segments import synthesize_segments
+from splitter import split_text
+from storage import StreamingUpload, get_cdn_url
+from synthesis import (
+    SAMPLE_RATE, CHUNK_MAX_CHARS, resolve_voice, voice_lang, get_speechkit_credentials,
+    build_synthesis_params, build_file_key, estimate_duration, lookup_cached_synthesis
+)
+
+DIALOGUE_MAX_LINES = 200
+
+# Пауза между репликами, мс
+DEFAULT_PAUSE_MS = 400
+MAX_PAUSE_MS = 5000
+
+
+def parse_script(raw_lines: list) -> list:
+    """
+    Приводит реплики сценария к виду {voice, lang, speed, text}.
+    Бросает ValueError с описанием первой некорректной реплики.
+    """
+    if not isinstance(raw_lines, list) or not raw_lines:
+        raise ValueError('script должен быть непустым массивом реплик')
+    if len(raw_lines) > DIALOGUE_MAX_LINES:
+        raise ValueError(f'Слишком много реплик (максимум {DIALOGUE_MAX_LINES})')
+
+    lines = []
+    for number, raw in enumerate(raw_lines, start=1):
+        if not isinstance(raw, dict):
+            raise ValueError(f'Реплика {number} должна быть объектом')
+        text = str(raw.get('text') or '').strip()
+        if not text:
+            raise ValueError(f'Реплика {number}: текст не может быть пустым')
+        voice_input = raw.get('voice', 'alena')
+        lines.append({
+            'voice': resolve_voice(voice_input),
+            'lang': voice_lang(voice_input),
+            'speed': raw.get('speed', 1.0),
+            'text': text
+        })
+
+    return lines
+
+
+def parse_pause(value) -> int:
+    """Возвращает паузу между репликами в мс в допустимых пределах"""
+    try:
+        pause_ms = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAUSE_MS
+    return max(0, min(MAX_PAUSE_MS, pause_ms))
+
+
+def script_text(lines: list) -> str:
+    """Текст сценария для проекта и учёта символов: реплика на строку"""
+    return '\n'.join(line['text'] for line in lines)
+
+
+def script_voices(lines: list) -> str:
+    """Голоса сценария через запятую в порядке появления"""
+    return ','.join(dict.fromkeys(line['voice'] for line in lines))
+
+
+def synthesize_dialogue(lines: list, format_type: str, pause_ms: int = DEFAULT_PAUSE_MS, user_id=None) -> dict:
+    """
+    Синтезирует все реплики параллельно и склеивает их по порядку,
+    вставляя между репликами тишину pause_ms. Фрагменты реплик
+    переиспользуются из кэша фрагментов, готовый диалог — из кэша синтеза.
+    """
+    cache_key = synthesis_cache_key(
+        json.dumps(
+            [[line['voice'], line['lang'], f'{float(line["speed"]):g}', line['text']] for line in lines],
+            ensure_ascii=False
+        ),
+        'dialogue', pause_ms / 1000, format_type, SAMPLE_RATE
+    )
+    cached = lookup_cached_synthesis(cache_key)
+    if cached:
+        return cached
+
+    api_key, folder_id = get_speechkit_credentials()
+
+    # Реплики делятся на фрагменты; все фрагменты всех реплик синтезируются одним пулом
+    chunks = []
+    chunk_params = []
+    line_ends = set()
+    for line in lines:
+        params = build_synthesis_params(line['voice'], line['speed'], format_type, folder_id, lang=line['lang'])
+        for chunk in split_text(line['text'], max_chars=CHUNK_MAX_CHARS):
+            chunks.append(chunk)
+            chunk_params.append(params)
+        line_ends.add(len(chunks) - 1)
+
+    file_key = build_file_key(user_id, format_type)
+    stitcher = get_stitcher(format_type, int(SAMPLE_RATE))
+    upload = StreamingUpload(file_key, format_type, reserve_header=stitcher.needs_header)
+
+    def on_chunk(index, audio):
+        upload.write_all(stitcher.feed(audio))
+        if index in line_ends and index != len(chunks) - 1:
+            upload.write_all(stitcher.silence(pause_ms / 1000))
+
+    try:
+        _, segments_reused = synthesize_segments(chunks, chunk_params, api_key, format_type, on_chunk=on_chunk)
+        upload.write_all(stitcher.finish())
+        upload.complete(header=stitcher.header(upload.size))
+    except Exception:
+        upload.abort()
+        raise
+
+    cdn_url = get_cdn_url(file_key)
+    text = script_text(lines)
+    audio_duration = int(round(stitcher.duration)) or estimate_duration(text, 1.0)
+
+    try:
+        store_cached_synthesis(cache_key, cdn_url, script_voices(lines)[:100], 1.0, format_type, len(text),
+                               audio_duration)
+    except Exception as cache_error:
+        print(f'Cache store error: {cache_error}')
+
+    return {
+        'audio_url': cdn_url,
+        'audio_duration': audio_duration,
+        'cached': False,
+        'coalesced': False,
+        'segments': {
+            'total': len(chunks),
+            'reused': segments_reused,
+            'reuse_ratio': round(segments_reused / len(chunks), 3)
+        }
+    }
@@ -0,0 +1,57 @@
+"""Модуль для локального кодирования PCM-мастера в сжатые форматы"""
+from audio import find_wav_data, PCM_CHANNELS, PCM_SAMPLE_WIDTH
+
+try:
+    import lameenc
+except ImportError:
+    lameenc = None
+
+# Речь в моно: 64 кбит/с достаточно; качество 2 — медленнее, но чище
+MP3_BITRATE = 64
+MP3_QUALITY = 2
+
+
+def can_encode(format_type: str) -> bool:
+    """Есть ли локальный кодировщик для формата"""
+    return format_type == 'mp3' and lameenc is not None
+
+
+def iter_pcm(pieces):
+    """Отдаёт PCM из потока WAV без заголовка, выровненный по границе отсчётов"""
+    header_skipped = False
+    remainder = b''
+    for piece in pieces:
+        data = remainder + bytes(piece)
+        if not header_skipped:
+            start, end = find_wav_data(memoryview(data))
+            if end == start == len(data):
+                remainder = data
+                continue
+            data = data[start:]
+            header_skipped = True
+        usable = len(data) - len(data) % (PCM_SAMPLE_WIDTH * PCM_CHANNELS)
+        remainder = data[usable:]
+        if usable:
+            yield data[:usable]
+
+
+def encode_mp3(pcm_pieces, sample_rate: int):
+    """Кодирует поток PCM в MP3 по частям"""
+    encoder = lameenc.Encoder()
+    encoder.set_bit_rate(MP3_BITRATE)
+    encoder.set_in_sample_rate(sample_rate)
+    encoder.set_channels(PCM_CHANNELS)
+    encoder.set_quality(MP3_QUALITY)
+
+    for pcm in pcm_pieces:
+        encoded = encoder.encode(pcm)
+        if encoded:
+            yield bytes(encoded)
+    yield bytes(encoder.flush())
+
+
+def encode_wav_stream(format_type: str, wav_pieces, sample_rate: int):
+    """Кодирует поток WAV-мастера в format_type; формат должен поддерживаться can_encode"""
+    if format_type == 'mp3':
+        return encode_mp3(iter_pcm(wav_pieces), sample_rate)
+    raise ValueError(f'Нет кодировщика для формата {format_type}')
@@ -0,0 +1,438 @@
+"""Модуль технического глоссария: глоссарии компилируются один раз на экземпляр, в запрос уходят только термины из текста"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from db import get_pooled_connection, release_connection
+from translation_memory import glossary_version
+
+# Встроенный глоссарий охраны труда: им засеяна таблица glossary_terms,
+# он же используется, пока БД недоступна
+TECHNICAL_GLOSSARIES = {
+    'en': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': 'personal protective equipment (PPE)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'PPE'},
+        {'sourceText': 'охрана труда', 'translatedText': 'occupational safety'},
+        {'sourceText': 'техника безопасности', 'translatedText': 'safety regulations'},
+        {'sourceText': 'производственная инструкция', 'translatedText': 'operating instruction'},
+        {'sourceText': 'технологический процесс', 'translatedText': 'technological process'},
+        {'sourceText': 'аварийная остановка', 'translatedText': 'emergency stop'},
+        {'sourceText': 'предохранительное устройство', 'translatedText': 'safety device'},
+        {'sourceText': 'защитное заземление', 'translatedText': 'protective grounding'},
+        {'sourceText': 'огнетушитель', 'translatedText': 'fire extinguisher'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': 'emergency exit'},
+        {'sourceText': 'производственная травма', 'translatedText': 'occupational injury'},
+        {'sourceText': 'вредные производственные факторы', 'translatedText': 'occupational hazards'},
+        {'sourceText': 'предельно допустимая концентрация', 'translatedText': 'maximum allowable concentration (MAC)'},
+        {'sourceText': 'ПДК', 'translatedText': 'MAC'},
+        {'sourceText': 'спецодежда', 'translatedText': 'work clothing'},
+        {'sourceText': 'респиратор', 'translatedText': 'respirator'},
+        {'sourceText': 'защитные очки', 'translatedText': 'safety goggles'},
+        {'sourceText': 'каска', 'translatedText': 'hard hat'},
+        {'sourceText': 'наряд-допуск', 'translatedText': 'work permit'},
+        {'sourceText': 'инструктаж по технике безопасности', 'translatedText': 'safety briefing'},
+        {'sourceText': 'знаки безопасности', 'translatedText': 'safety signs'},
+        {'sourceText': 'первая помощь', 'translatedText': 'first aid'},
+        {'sourceText': 'несчастный случай', 'translatedText': 'accident'},
+        {'sourceText': 'профессиональное заболевание', 'translatedText': 'occupational disease'},
+        {'sourceText': 'рабочее место', 'translatedText': 'workplace'},
+        {'sourceText': 'условия труда', 'translatedText': 'working conditions'},
+        {'sourceText': 'режим труда и отдыха', 'translatedText': 'work and rest schedule'}
+    ],
+    'de': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': 'persönliche Schutzausrüstung (PSA)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'PSA'},
+        {'sourceText': 'охрана труда', 'translatedText': 'Arbeitsschutz'},
+        {'sourceText': 'техника безопасности', 'translatedText': 'Sicherheitsvorschriften'},
+        {'sourceText': 'производственная инструкция', 'translatedText': 'Betriebsanweisung'},
+        {'sourceText': 'технологический процесс', 'translatedText': 'technologischer Prozess'},
+        {'sourceText': 'аварийная остановка', 'translatedText': 'Not-Aus'},
+        {'sourceText': 'предохранительное устройство', 'translatedText': 'Schutzeinrichtung'},
+        {'sourceText': 'защитное заземление', 'translatedText': 'Schutzerdung'},
+        {'sourceText': 'огнетушитель', 'translatedText': 'Feuerlöscher'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': 'Notausgang'},
+        {'sourceText': 'производственная травма', 'translatedText': 'Arbeitsunfall'},
+        {'sourceText': 'спецодежда', 'translatedText': 'Arbeitskleidung'},
+        {'sourceText': 'респиратор', 'translatedText': 'Atemschutzgerät'},
+        {'sourceText': 'защитные очки', 'translatedText': 'Schutzbrille'},
+        {'sourceText': 'каска', 'translatedText': 'Schutzhelm'},
+        {'sourceText': 'наряд-допуск', 'translatedText': 'Arbeitserlaubnis'},
+        {'sourceText': 'первая помощь', 'translatedText': 'Erste Hilfe'},
+        {'sourceText': 'рабочее место', 'translatedText': 'Arbeitsplatz'}
+    ],
+    'fr': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': 'équipement de protection individuelle (EPI)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'EPI'},
+        {'sourceText': 'охрана труда', 'translatedText': 'sécurité au travail'},
+        {'sourceText': 'техника безопасности', 'translatedText': 'consignes de sécurité'},
+        {'sourceText': 'производственная инструкция', 'translatedText': 'instruction de travail'},
+        {'sourceText': 'технологический процесс', 'translatedText': 'procédé technologique'},
+        {'sourceText': 'аварийная остановка', 'translatedText': 'arrêt d\'urgence'},
+        {'sourceText': 'предохранительное устройство', 'translatedText': 'dispositif de sécurité'},
+        {'sourceText': 'защитное заземление', 'translatedText': 'mise à la terre de protection'},
+        {'sourceText': 'огнетушитель', 'translatedText': 'extincteur'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': 'sortie de secours'},
+        {'sourceText': 'спецодежда', 'translatedText': 'vêtements de travail'},
+        {'sourceText': 'респиратор', 'translatedText': 'appareil respiratoire'},
+        {'sourceText': 'защитные очки', 'translatedText': 'lunettes de protection'},
+        {'sourceText': 'каска', 'translatedText': 'casque de protection'},
+        {'sourceText': 'первая помощь', 'translatedText': 'premiers secours'}
+    ],
+    'es': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': 'equipo de protección individual (EPI)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'EPI'},
+        {'sourceText': 'охрана труда', 'translatedText': 'seguridad laboral'},
+        {'sourceText': 'техника безопасности', 'translatedText': 'normas de seguridad'},
+        {'sourceText': 'производственная инструкция', 'translatedText': 'instrucción de trabajo'},
+        {'sourceText': 'технологический процесс', 'translatedText': 'proceso tecnológico'},
+        {'sourceText': 'аварийная остановка', 'translatedText': 'parada de emergencia'},
+        {'sourceText': 'предохранительное устройство', 'translatedText': 'dispositivo de seguridad'},
+        {'sourceText': 'защитное заземление', 'translatedText': 'toma de tierra de protección'},
+        {'sourceText': 'огнетушитель', 'translatedText': 'extintor'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': 'salida de emergencia'},
+        {'sourceText': 'спецодежда', 'translatedText': 'ropa de trabajo'},
+        {'sourceText': 'респиратор', 'translatedText': 'respirador'},
+        {'sourceText': 'защитные очки', 'translatedText': 'gafas de seguridad'},
+        {'sourceText': 'каска', 'translatedText': 'casco de seguridad'}
+    ],
+    'zh': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': '个人防护装备 (PPE)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'PPE'},
+        {'sourceText': 'охрана труда', 'translatedText': '劳动保护'},
+        {'sourceText': 'техника безопасности', 'translatedText': '安全技术'},
+        {'sourceText': 'производственная инструкция', 'translatedText': '生产指令'},
+        {'sourceText': 'технологический процесс', 'translatedText': '工艺流程'},
+        {'sourceText': 'аварийная остановка', 'translatedText': '紧急停止'},
+        {'sourceText': 'предохранительное устройство', 'translatedText': '保护装置'},
+        {'sourceText': 'защитное заземление', 'translatedText': '保护接地'},
+        {'sourceText': 'огнетушитель', 'translatedText': '灭火器'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': '紧急出口'},
+        {'sourceText': 'спецодежда', 'translatedText': '工作服'},
+        {'sourceText': 'респиратор', 'translatedText': '呼吸器'},
+        {'sourceText': 'защитные очки', 'translatedText': '护目镜'},
+        {'sourceText': 'каска', 'translatedText': '安全帽'}
+    ],
+    'ja': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': '個人用保護具 (PPE)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'PPE'},
+        {'sourceText': 'охрана труда', 'translatedText': '労働安全'},
+        {'sourceText': 'техника безопасности', 'translatedText': '安全規則'},
+        {'sourceText': 'производственная инструкция', 'translatedText': '作業指示書'},
+        {'sourceText': 'технологический процесс', 'translatedText': '技術プロセス'},
+        {'sourceText': 'аварийная остановка', 'translatedText': '緊急停止'},
+        {'sourceText': 'огнетушитель', 'translatedText': '消火器'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': '非常口'},
+        {'sourceText': 'спецодежда', 'translatedText': '作業服'},
+        {'sourceText': 'каска', 'translatedText': 'ヘルメット'}
+    ],
+    'ko': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': '개인 보호 장비 (PPE)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'PPE'},
+        {'sourceText': 'охрана труда', 'translatedText': '산업 안전'},
+        {'sourceText': 'техника безопасности', 'translatedText': '안전 규정'},
+        {'sourceText': 'производственная инструкция', 'translatedText': '작업 지침'},
+        {'sourceText': 'технологический процесс', 'translatedText': '기술 프로세스'},
+        {'sourceText': 'аварийная остановка', 'translatedText': '비상 정지'},
+        {'sourceText': 'огнетушитель', 'translatedText': '소화기'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': '비상구'}
+    ],
+    'it': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': 'dispositivi di protezione individuale (DPI)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'DPI'},
+        {'sourceText': 'охрана труда', 'translatedText': 'sicurezza sul lavoro'},
+        {'sourceText': 'техника безопасности', 'translatedText': 'norme di sicurezza'},
+        {'sourceText': 'производственная инструкция', 'translatedText': 'istruzione operativa'},
+        {'sourceText': 'технологический процесс', 'translatedText': 'processo tecnologico'},
+        {'sourceText': 'аварийная остановка', 'translatedText': 'arresto di emergenza'},
+        {'sourceText': 'огнетушитель', 'translatedText': 'estintore'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': 'uscita di emergenza'}
+    ],
+    'pt': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': 'equipamento de proteção individual (EPI)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'EPI'},
+        {'sourceText': 'охрана труда', 'translatedText': 'segurança do trabalho'},
+        {'sourceText': 'техника безопасности', 'translatedText': 'normas de segurança'},
+        {'sourceText': 'производственная инструкция', 'translatedText': 'instrução de trabalho'},
+        {'sourceText': 'технологический процесс', 'translatedText': 'processo tecnológico'},
+        {'sourceText': 'аварийная остановка', 'translatedText': 'parada de emergência'},
+        {'sourceText': 'огнетушитель', 'translatedText': 'extintor'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': 'saída de emergência'}
+    ],
+    'tr': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': 'kişisel koruyucu ekipman (KKE)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'KKE'},
+        {'sourceText': 'охрана труда', 'translatedText': 'iş güvenliği'},
+        {'sourceText': 'техника безопасности', 'translatedText': 'güvenlik kuralları'},
+        {'sourceText': 'производственная инструкция', 'translatedText': 'çalışma talimatı'},
+        {'sourceText': 'аварийная остановка', 'translatedText': 'acil durdurma'},
+        {'sourceText': 'огнетушитель', 'translatedText': 'yangın söndürücü'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': 'acil çıkış'}
+    ],
+    'pl': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': 'środki ochrony indywidualnej (ŚOI)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'ŚOI'},
+        {'sourceText': 'охрана труда', 'translatedText': 'bezpieczeństwo pracy'},
+        {'sourceText': 'техника безопасности', 'translatedText': 'zasady bezpieczeństwa'},
+        {'sourceText': 'производственная инструкция', 'translatedText': 'instrukcja robocza'},
+        {'sourceText': 'аварийная остановка', 'translatedText': 'zatrzymanie awaryjne'},
+        {'sourceText': 'огнетушитель', 'translatedText': 'gaśnica'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': 'wyjście ewakuacyjne'}
+    ],
+    'ar': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': 'معدات الحماية الشخصية (PPE)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'PPE'},
+        {'sourceText': 'охрана труда', 'translatedText': 'السلامة المهنية'},
+        {'sourceText': 'техника безопасности', 'translatedText': 'لوائح السلامة'},
+        {'sourceText': 'аварийная остановка', 'translatedText': 'إيقاف الطوارئ'},
+        {'sourceText': 'огнетушитель', 'translatedText': 'طفاية حريق'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': 'مخرج الطوارئ'}
+    ],
+    'kk': [
+        {'sourceText': 'средства индивидуальной защиты', 'translatedText': 'жеке қорғану құралдары (ЖҚҚ)'},
+        {'sourceText': 'СИЗ', 'translatedText': 'ЖҚҚ'},
+        {'sourceText': 'охрана труда', 'translatedText': 'еңбек қорғау'},
+        {'sourceText': 'техника безопасности', 'translatedText': 'қауіпсіздік техникасы'},
+        {'sourceText': 'аварийная остановка', 'translatedText': 'авариялық тоқтату'},
+        {'sourceText': 'огнетушитель', 'translatedText': 'өрт сөндіргіш'},
+        {'sourceText': 'эвакуационный выход', 'translatedText': 'эвакуациялық шығу'}
+    ]
+}
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Окончания русских существительных и прилагательных по длине; отсекается самое длинное
+ENDINGS = {
+    4: {'иями'},
+    3: {'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'иях', 'иям', 'ием', 'ией'},
+    2: {'ой', 'ей', 'ый', 'ий', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ую', 'юю', 'ом', 'ем', 'ах', 'ях',
+        'ов', 'ев', 'ам', 'ям', 'ою', 'ею', 'ия', 'ья', 'ию', 'ью', 'ии', 'ым', 'им', 'ых', 'их'},
+    1: {'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й'}
+}
+
+# Короче основа не обрезается: аббревиатуры вроде СИЗ и ПДК сравниваются целиком
+MIN_STEM_LENGTH = 3
+
+# Метка конца термина в узле префиксного дерева
+TERM_END = ''
+
+# Сколько скомпилированных глоссариев (общий и пользовательские) держит тёплый экземпляр
+COMPILED_CACHE_SIZE = 64
+
+# Версия общего глоссария хранится под user_id = 0
+GLOBAL_SCOPE = 0
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Основа слова в нижнем регистре: падежи и числа одного слова дают одну основу"""
+    for length in (4, 3, 2, 1):
+        if len(word) - length >= MIN_STEM_LENGTH and word[-length:] in ENDINGS[length]:
+            return word[:-length]
+    return word
+
+
+def tokenize(text: str) -> list:
+    """Основы слов текста по порядку"""
+    return [stem(word) for word in WORD_PATTERN.findall(text.lower().replace('ё', 'е'))]
+
+
+class Glossary:
+    """
+    Глоссарий {язык: [пары]} с префиксным деревом по основам слов всех
+    исходных терминов; дерево строится при первом поиске и общее для всех языков.
+    """
+
+    def __init__(self, pairs_by_language: dict, version: str):
+        self.pairs_by_language = pairs_by_language
+        self.version = version
+        self._trie = None
+        self._longest = 0
+        self._language_versions = {}
+        self._lock = threading.Lock()
+
+    def _compile(self):
+        with self._lock:
+            if self._trie is not None:
+                return
+            trie = {}
+            longest = 0
+            for pairs in self.pairs_by_language.values():
+                for pair in pairs:
+                    stems = tokenize(pair['sourceText'])
+                    if not stems:
+                        continue
+                    node = trie
+                    for word_stem in stems:
+                        node = node.setdefault(word_stem, {})
+                    node[TERM_END] = pair['sourceText']
+                    longest = max(longest, len(stems))
+            self._longest = longest
+            self._trie = trie
+
+    def find_terms(self, text: str) -> set:
+        """Исходные термины глоссария, которые встречаются в тексте в любой форме"""
+        if self._trie is None:
+            self._compile()
+        trie, longest = self._trie, self._longest
+        stems = tokenize(text)
+        found = set()
+
+        for start, word_stem in enumerate(stems):
+            node = trie.get(word_stem)
+            position = start + 1
+            while node is not None:
+                term = node.get(TERM_END)
+                if term:
+                    found.add(term)
+                if position >= len(stems) or position - start >= longest:
+                    break
+                node = node.get(stems[position])
+                position += 1
+
+        return found
+
+    def language_pairs(self, target_language: str) -> list:
+        """Полный глоссарий языка"""
+        return self.pairs_by_language.get(target_language, [])
+
+    def language_version(self, target_language: str) -> str:
+        """Версия глоссария языка для ключа памяти переводов: хэш его пар"""
+        version = self._language_versions.get(target_language)
+        if version is None:
+            version = glossary_version(self.language_pairs(target_language))
+            self._language_versions[target_language] = version
+        return version
+
+    def match(self, text: str, target_language: str, terms: set = None) -> list:
+        """
+        Пары глоссария языка, исходный термин которых встречается в тексте.
+        terms — уже найденные find_terms термины, чтобы не разбирать текст повторно.
+        """
+        pairs = self.language_pairs(target_language)
+        if not pairs:
+            return []
+        if terms is None:
+            terms = self.find_terms(text)
+        return [pair for pair in pairs if pair['sourceText'] in terms]
+
+
+BUILTIN_GLOSSARY = Glossary(TECHNICAL_GLOSSARIES, 'builtin')
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def _load_versions(user_id) -> tuple:
+    """Одним запросом читает счётчики версий общего и пользовательского глоссариев"""
+    conn = get_pooled_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            SELECT user_id, version
+            FROM glossary_versions
+            WHERE user_id IN (%s, %s)
+        """, (GLOBAL_SCOPE, user_id or GLOBAL_SCOPE))
+        versions = dict(cur.fetchall())
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    return versions.get(GLOBAL_SCOPE, 0), versions.get(user_id, 0) if user_id else 0
+
+
+def _load_pairs(user_id) -> dict:
+    """Загружает общий глоссарий и термины пользователя; термин пользователя заменяет общий"""
+    conn = get_pooled_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            SELECT target_language, source_text, translated_text
+            FROM glossary_terms
+            WHERE user_id IS NULL OR user_id = %s
+            ORDER BY (user_id IS NOT NULL), id
+        """, (user_id,))
+        rows = cur.fetchall()
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    terms = {}
+    for target_language, source_text, translated_text in rows:
+        terms.setdefault(target_language, {})[source_text] = translated_text
+
+    return {
+        language: [{'sourceText': source, 'translatedText': translated} for source, translated in pairs.items()]
+        for language, pairs in terms.items()
+    }
+
+
+def get_glossary(user_id=None) -> Glossary:
+    """
+    Возвращает скомпилированный глоссарий пользователя (общий плюс его термины).
+    На каждый вызов — один запрос счётчиков версий; термины перечитываются
+    и дерево перестраивается, только если версия изменилась.
+    Если БД недоступна, используется встроенный глоссарий.
+    """
+    try:
+        user_id = int(user_id) if user_id else None
+    except (TypeError, ValueError):
+        user_id = None
+
+    try:
+        global_version, user_version = _load_versions(user_id)
+    except Exception as db_error:
+        print(f'Glossary error: {db_error}')
+        return BUILTIN_GLOSSARY
+
+    # Пользователь без своих терминов получает общий глоссарий
+    owner = user_id if user_version else None
+    key = (owner, global_version, user_version)
+
+    with _compiled_lock:
+        glossary = _compiled.get(key)
+        if glossary:
+            _compiled.move_to_end(key)
+            return glossary
+
+    try:
+        pairs_by_language = _load_pairs(owner)
+    except Exception as db_error:
+        print(f'Glossary error: {db_error}')
+        return BUILTIN_GLOSSARY
+
+    glossary = Glossary(pairs_by_language, f'{global_version}.{user_version}')
+    with _compiled_lock:
+        _compiled[key] = glossary
+        while len(_compiled) > COMPILED_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return glossary
+
+
+def benchmark(sizes=(10_000, 100_000, 1_000_000), repeats: int = 3):
+    """Замеряет поиск терминов на длинных документах: python glossary.py"""
+    sample = (
+        'Перед началом работ проводится инструктаж по технике безопасности. '
+        'Работник обязан использовать средства индивидуальной защиты: каску, защитные очки и респиратор. '
+        'При несчастном случае оказывается первая помощь, оборудование переводится в режим аварийной остановки. '
+        'Смена длится восемь часов, перерывы предусмотрены графиком, который утверждает руководитель участка.\n\n'
+    )
+    glossary = BUILTIN_GLOSSARY
+    glossary.find_terms('')
+    for size in sizes:
+        text = (sample * (size // len(sample) + 1))[:size]
+        best = None
+        for _ in range(repeats):
+            stem.cache_clear()
+            started = time.perf_counter()
+            terms = glossary.find_terms(text)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        pairs = glossary.match(text, 'en', terms)
+        print(f'{size:>9} символов: {best * 1000:7.1f} мс, терминов {len(terms)}, пар для en {len(pairs)}')
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -1,18 +1,43 @@
 import json
-import os
-import requests
-import uuid
-import boto3
-import re
-import psycopg2
-from datetime import datetime
-from io import BytesIO
+from db import get_db_connection
+from speechkit import SpeechKitError
+from synthesis import synthesize_text, synthesize_preview, resolve_voice, voice_lang, ConfigurationError
+from usage import record_generation, record_generations
+from quota import get_user_plan, reserve_characters, refund_characters, QuotaExceededError
+from jobs import enqueue_job, get_job, run_worker, JOB_MAX_CHARS
+from playlist import get_playlist_urls, PLAYLIST_FORMATS
+from batch import parse_batch_items, synthesize_batch, batch_max_chars, BATCH_MAX_ITEMS
+from dialogue import parse_script, parse_pause, script_text, script_voices, synthesize_dialogue
+from rate_limit import lane, plan_lane, RateLimitExceeded, LANE_HIGH, LANE_NORMAL
+from circuit_breaker import CircuitOpenError
+from pipeline import translate_and_speak, default_voice, voice_speaks
+from yandex_translate import TranslateError
+
 
 def handler(event: dict, context) -> dict:
     """
     Синтез речи из текста через Yandex SpeechKit.
     Преобразует текст в аудио, сохраняет в S3 и возвращает ссылку.
+    Длинные тексты ставятся в очередь (async: true), статус — GET ?jobId=...
+    Режим preview: true озвучивает только первый фрагмент, без проекта и списания символов.
+    Режим output: "playlist" ставит задание в очередь и сразу отдаёт плейлист (m3u8/JSON),
+    который пополняется фрагментами по мере синтеза.
+    Пакет текстов (items: [...]) синтезируется параллельно за один вызов.
+    Диалог (script: [{voice, speed, text}, ...]) озвучивается разными голосами в один файл.
+    keepMaster: true сохраняет PCM-мастер, из которого другие форматы кодируются без SpeechKit.
+    translateTo: "en" переводит текст и озвучивает перевод голосом этого языка в одном вызове.
+    Вызов по таймер-триггеру обрабатывает очередь заданий.
     """
+    # Таймер-триггер: разбираем очередь асинхронных заданий
+    if 'messages' in event:
+        result = run_worker()
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps(result),
+            'isBase64Encoded': False
+        }
+    
     method = event.get('httpMethod', 'POST')
     
     if method == 'OPTIONS':
@@ -20,7 +45,7 @@ def handler(event: dict, context) -> dict:
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
                 'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
                 'Access-Control-Max-Age': '86400'
             },
@@ -28,6 +53,9 @@ def handler(event: dict, context) -> dict:
             'isBase64Encoded': False
         }
     
+    if method == 'GET':
+        return get_job_status(event)
+    
     if method != 'POST':
         return {
             'statusCode': 405,
@@ -39,40 +67,74 @@ def handler(event: dict, context) -> dict:
             'isBase64Encoded': False
         }
     
+    conn = None
+    reserved = 0
+    limit_was_reset = False
     try:
         body = json.loads(event.get('body', '{}'))
+        if 'items' in body:
+            return batch_response(body)
+        
         text = body.get('text', '').strip()
         voice_input = body.get('voice', 'alena')
         speed = body.get('speed', 1.0)
         format_type = body.get('format', 'mp3')
         user_id = body.get('userId')
+        is_async = bool(body.get('async', False))
+        is_preview = bool(body.get('preview', False))
+        # Плейлист из фрагментов отдаётся через очередь: ссылка на него известна сразу,
+        # а первые фрагменты синтезируются до ответа
+        is_playlist = body.get('output') == 'playlist'
+        if is_playlist:
+            is_async = True
         
-        # Маппинг имён голосов на реальные идентификаторы Yandex API
-        voice_map = {
-            # Бесплатные голоса (русский)
-            'alena': 'alena',
-            'filipp': 'filipp',
-            'ermil': 'ermil',
-            'jane': 'jane',
-            'omazh': 'omazh',
-            'zahar': 'zahar',
-            # Премиум нейронные голоса (русский)
-            'alena_premium': 'alena',
-            'filipp_premium': 'filipp',
-            # Английский
-            'john': 'john',
-            'jane-en': 'jane',
-            'madirus': 'madirus',
-            # Другие языки
-            'lea': 'lea',
-            'bruno': 'bruno',
-            'amira': 'amira',
-            'nigora': 'nigora',
-            'madi': 'madi',
-            'aylin': 'aylin'
-        }
+        voice = resolve_voice(voice_input)
+        # Язык определяется по имени голоса от клиента: jane-en и jane — один голос SpeechKit
+        lang = voice_lang(voice_input)
         
-        voice = voice_map.get(voice_input, voice_input)
+        # Диалог: реплики разными голосами, склеенные с паузами в один проект
+        dialogue = None
+        if 'script' in body:
+            try:
+                dialogue = parse_script(body.get('script'))
+                if is_async or is_preview:
+                    raise ValueError('Сценарий диалога синтезируется только синхронно')
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'error': str(e)}),
+                    'isBase64Encoded': False
+                }
+            text = script_text(dialogue)
+            voice = script_voices(dialogue)[:100]
+        
+        # Перевести и озвучить: голос по умолчанию подбирается по языку перевода,
+        # выбранный клиентом голос должен говорить на этом языке
+        translate_to = body.get('translateTo')
+        if translate_to:
+            translate_error = None
+            if dialogue or is_async or is_preview:
+                translate_error = 'Перевод с озвучкой выполняется только синхронно и без сценария'
+            elif not default_voice(translate_to):
+                translate_error = f'Озвучка недоступна для языка {translate_to}'
+            elif 'voice' in body and not voice_speaks(voice_input, translate_to):
+                translate_error = f'Голос {voice_input} не озвучивает язык {translate_to}'
+            if translate_error:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'error': translate_error}),
+                    'isBase64Encoded': False
+                }
+            if 'voice' not in body:
+                voice = default_voice(translate_to)
         
         if not text:
             return {
@@ -86,23 +148,21 @@ def handler(event: dict, context) -> dict:
             }
         
         max_chars = 5000
+        request_lane = LANE_NORMAL
         if user_id:
+            # Подключение открывается один раз: тариф, резерв символов и учёт генерации
+            conn = get_db_connection()
             try:
-                dsn = os.environ.get('DATABASE_URL')
-                if dsn:
-                    schema_name = os.environ.get('MAIN_DB_SCHEMA', 'public')
-                    dsn_check = f"{dsn} options='-c search_path={schema_name}'"
-                    conn_check = psycopg2.connect(dsn_check)
-                    cur_check = conn_check.cursor()
-                    cur_check.execute("SELECT role, plan FROM users WHERE id = %s", (user_id,))
-                    row = cur_check.fetchone()
-                    if row and (row[0] == 'admin' or row[1] == 'unlimited'):
-                        max_chars = 8000
-                    cur_check.close()
-                    conn_check.close()
+                plan = get_user_plan(user_id, conn=conn)
+                if plan:
+                    max_chars = plan['max_request_chars']
+                    request_lane = plan_lane(plan['role'], plan['plan'])
             except Exception:
                 pass
-
+        # Длинные тексты в очереди — только для пользователя, за которым резервируются символы
+        if is_async and user_id:
+            max_chars = JOB_MAX_CHARS
+        
         if len(text) > max_chars:
             return {
                 'statusCode': 400,
@@ -114,208 +174,342 @@ def handler(event: dict, context) -> dict:
                 'isBase64Encoded': False
             }
         
-        api_key = os.environ.get('YANDEX_SPEECHKIT_API_KEY')
-        folder_id = os.environ.get('YANDEX_FOLDER_ID')
+        if is_playlist and format_type not in PLAYLIST_FORMATS:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'error': f'Плейлист недоступен для формата {format_type}'}),
+                'isBase64Encoded': False
+            }
+        
+        # Предпросмотр: первый фрагмент, без проекта и списания символов
+        if is_preview:
+            return preview_response(text, voice, speed, format_type, lang)
+        
+        # Символы резервируются до обращения к SpeechKit; при ошибке возвращаются в finally
+        if user_id:
+            try:
+                reservation = reserve_characters(user_id, len(text), conn=conn)
+            except QuotaExceededError as e:
+                return {
+                    'statusCode': 403,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({
+                        'error': str(e),
+                        'characters_used': e.characters_used,
+                        'character_limit': e.character_limit
+                    }),
+                    'isBase64Encoded': False
+                }
+            if reservation:
+                reserved = len(text)
+                limit_was_reset = reservation['limit_reset']
         
-        if not api_key:
+        # Асинхронный режим: задание в очередь, ответ сразу. Резерв переходит к заданию
+        if is_async:
+            if not reserved:
+                return {
+                    'statusCode': 401,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'error': 'Очередь синтеза доступна только зарегистрированным пользователям'}),
+                    'isBase64Encoded': False
+                }
+            # Начало плейлиста синтезируется до ответа, в полосе запроса
+            with lane(request_lane):
+                job_id = enqueue_job(user_id, text, voice, speed, format_type, playlist=is_playlist, lang=lang)
+            reserved = 0
             return {
-                'statusCode': 500,
+                'statusCode': 202,
                 'headers': {
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': '*'
                 },
-                'body': json.dumps({'error': 'API ключ Yandex SpeechKit не настроен'}),
+                'body': json.dumps({
+                    'job_id': job_id,
+                    'status': 'queued',
+                    'character_count': len(text),
+                    'playlist': get_playlist_urls(job_id, format_type) if is_playlist else None
+                }),
                 'isBase64Encoded': False
             }
         
-        if not folder_id:
+        try:
+            with lane(request_lane):
+                if dialogue:
+                    result = synthesize_dialogue(dialogue, format_type, parse_pause(body.get('pauseMs')), user_id=user_id)
+                elif translate_to:
+                    result = translate_and_speak(text, translate_to, body.get('sourceLanguage', 'auto'), voice, speed,
+                                                 format_type, technical=bool(body.get('technical', False)),
+                                                 user_id=user_id)
+                else:
+                    result = synthesize_text(text, voice, speed, format_type, user_id=user_id,
+                                             keep_master=bool(body.get('keepMaster', False)), lang=lang)
+        except CircuitOpenError as e:
+            # SpeechKit недоступен: обычный текст пользователя уходит в очередь, резерв символов переходит к заданию
+            if not dialogue and not translate_to and reserved:
+                try:
+                    job_id = enqueue_job(user_id, text, voice, speed, format_type, lang=lang)
+                    reserved = 0
+                    return {
+                        'statusCode': 202,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({
+                            'job_id': job_id,
+                            'status': 'queued',
+                            'character_count': len(text),
+                            'reason': str(e)
+                        }),
+                        'isBase64Encoded': False
+                    }
+                except Exception as queue_error:
+                    print(f'Queue fallback error: {queue_error}')
+            return circuit_open_response(e)
+        except ConfigurationError as e:
             return {
                 'statusCode': 500,
                 'headers': {
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': '*'
                 },
-                'body': json.dumps({'error': 'YANDEX_FOLDER_ID не настроен'}),
+                'body': json.dumps({'error': str(e)}),
+                'isBase64Encoded': False
+            }
+        except SpeechKitError as e:
+            return {
+                'statusCode': e.status_code,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'error': f'Ошибка Yandex API: {e.message}'
+                }),
+                'isBase64Encoded': False
+            }
+        except TranslateError as e:
+            return {
+                'statusCode': e.status_code,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'error': f'Ошибка Yandex Translate API: {e.message}'
+                }),
+                'isBase64Encoded': False
+            }
+        except RateLimitExceeded as e:
+            return {
+                'statusCode': 429,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Retry-After': str(max(1, round(e.retry_after)))
+                },
+                'body': json.dumps({'error': str(e)}),
                 'isBase64Encoded': False
             }
         
-        url = 'https://tts.api.cloud.yandex.net/speech/v1/tts:synthesize'
-        headers = {
-            'Authorization': f'Api-Key {api_key}'
-        }
-        
-        format_map = {
-            'mp3': 'mp3',
-            'wav': 'lpcm',
-            'ogg': 'oggopus'
-        }
+        cdn_url = result['audio_url']
+        audio_duration = result['audio_duration']
         
-        # Разбиваем текст на части по 1000 символов по границам предложений
-        def split_text(text, max_chars=1000):
-            sentences = re.split(r'(?<=[.!?])\s+', text)
-            chunks = []
-            current_chunk = ''
-            
-            for sentence in sentences:
-                if len(current_chunk) + len(sentence) <= max_chars:
-                    current_chunk += sentence + ' '
+        # Сохраняем проект и обновляем статистику
+        project_id = None
+        if user_id:
+            try:
+                # Проект перевода хранит перевод как текст проекта, а исходный текст — рядом.
+                # Символы считаются по исходному тексту: столько же зарезервировано в квоте
+                if translate_to:
+                    usage = record_generation(user_id, result['translated_text'], cdn_url, voice, speed, format_type,
+                                              audio_duration, conn=conn if conn is not None and not conn.closed else None,
+                                              source_text=text, source_language=result['detected_language'],
+                                              target_language=translate_to, character_count=len(text))
                 else:
-                    if current_chunk:
-                        chunks.append(current_chunk.strip())
-                    current_chunk = sentence + ' '
-            
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            
-            return chunks
-        
-        text_chunks = split_text(text, max_chars=500)
-        audio_chunks = []
-        
-        # Синтезируем каждую часть
-        for chunk in text_chunks:
-            data = {
-                'text': chunk,
-                'voice': voice,
-                'speed': str(speed),
-                'format': format_map.get(format_type, 'mp3'),
-                'sampleRateHertz': '48000',
-                'folderId': folder_id
-            }
-            
-            response = requests.post(url, headers=headers, data=data, timeout=10)
-            
-            if response.status_code != 200:
-                error_text = response.text
+                    usage = record_generation(user_id, text, cdn_url, voice, speed, format_type, audio_duration,
+                                              conn=conn if conn is not None and not conn.closed else None)
+                project_id = usage['project_id']
+                # Повтор только что сохранённого запроса не списывает символы второй раз
+                if not usage['duplicate']:
+                    reserved = 0
+            except Exception as db_error:
+                print(f'Database error: {db_error}')
                 return {
-                    'statusCode': response.status_code,
+                    'statusCode': 500,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
                     'body': json.dumps({
-                        'error': f'Ошибка Yandex API: {error_text}'
+                        'error': f'Ошибка сохранения: {str(db_error)}. Пожалуйста, обратитесь к администратору.'
                     }),
                     'isBase64Encoded': False
                 }
-            
-            audio_chunks.append(response.content)
-        
-        # Склеиваем аудио части (для MP3 просто конкатенация)
-        audio_data = b''.join(audio_chunks)
-        
-        s3 = boto3.client('s3',
-            endpoint_url='https://bucket.poehali.dev',
-            aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-            aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY']
-        )
-        
-        file_id = str(uuid.uuid4())
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        file_key = f'voice/{user_id or "anonymous"}/{timestamp}_{file_id}.{format_type}'
         
-        content_types = {
-            'mp3': 'audio/mpeg',
-            'wav': 'audio/wav',
-            'ogg': 'audio/ogg'
+        response_body = {
+            'audio_url': cdn_url,
+            'format': format_type,
+            'character_count': len(text),
+            'voice': voice,
+            'audio_duration': audio_duration,
+            'limit_reset': limit_was_reset,
+            'project_id': project_id,
+            'cached': result['cached'],
+            'coalesced': result['coalesced'],
+            'segments': result['segments']
         }
+        if translate_to:
+            response_body.update({
+                'translated_text': result['translated_text'],
+                'source_language': result['detected_language'],
+                'target_language': translate_to,
+                'translation_memory': {'hits': result['memory_hits'], 'misses': result['memory_misses']}
+            })
         
-        s3.put_object(
-            Bucket='files',
-            Key=file_key,
-            Body=audio_data,
-            ContentType=content_types.get(format_type, 'audio/mpeg')
-        )
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps(response_body),
+            'isBase64Encoded': False
+        }
+    
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({
+                'error': f'Внутренняя ошибка: {str(e)}'
+            }),
+            'isBase64Encoded': False
+        }
+    finally:
+        if reserved:
+            try:
+                refund_characters(user_id, reserved, conn=conn)
+            except Exception as refund_error:
+                print(f'Quota refund error: {refund_error}')
+        if conn is not None:
+            conn.close()
+
+
+def batch_response(body: dict) -> dict:
+    """
+    Пакетный синтез: символы резервируются на весь пакет, проекты
+    сохраняются одной вставкой, за неудавшиеся элементы символы возвращаются.
+    """
+    raw_items = body.get('items')
+    user_id = body.get('userId')
+    
+    if not isinstance(raw_items, list) or not raw_items:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'items должен быть непустым массивом'}),
+            'isBase64Encoded': False
+        }
+    
+    if len(raw_items) > BATCH_MAX_ITEMS:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': f'Слишком много элементов (максимум {BATCH_MAX_ITEMS})'}),
+            'isBase64Encoded': False
+        }
+    
+    conn = None
+    reserved = 0
+    try:
+        max_chars = 5000
+        request_lane = LANE_NORMAL
+        plan = None
+        if user_id:
+            conn = get_db_connection()
+            plan = get_user_plan(user_id, conn=conn)
+            if plan:
+                max_chars = plan['max_request_chars']
+                request_lane = plan_lane(plan['role'], plan['plan'])
         
-        cdn_url = f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{file_key}"
+        items, errors = parse_batch_items(raw_items, max_chars)
+        total_chars = sum(len(item['text']) for item in items)
         
-        # Примерная длительность аудио: 150 слов в минуту = 2.5 слова в секунду
-        word_count = len(text.split())
-        audio_duration = int((word_count / 2.5) / speed)
+        # Пакет синтезируется синхронно, поэтому его общий объём ограничен
+        total_max_chars = batch_max_chars(max_chars, plan is not None)
+        if total_chars > total_max_chars:
+            return {
+                'statusCode': 400,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'error': f'Пакет слишком большой (максимум {total_max_chars} символов). Используйте очередь синтеза.'
+                }),
+                'isBase64Encoded': False
+            }
         
-        # Сохраняем проект и обновляем статистику
-        limit_was_reset = False
-        if user_id:
+        if user_id and total_chars:
             try:
-                dsn = os.environ.get('DATABASE_URL')
-                if not dsn:
-                    raise Exception('DATABASE_URL не настроен')
-                
-                # Добавляем схему в строку подключения
-                schema_name = os.environ.get('MAIN_DB_SCHEMA', 'public')
-                dsn_with_schema = f"{dsn} options='-c search_path={schema_name}'"
-                
-                conn = psycopg2.connect(dsn_with_schema)
-                cur = conn.cursor()
-                
-                # Проверяем и сбрасываем лимит если начался новый месяц
-                cur.execute("""
-                    SELECT usage_reset_date, characters_used
-                    FROM users
-                    WHERE id = %s
-                """, (user_id,))
-                
-                user_data = cur.fetchone()
-                if user_data:
-                    last_reset = user_data[0]
-                    current_date = datetime.now().date()
-                    
-                    # Если прошел месяц с последнего сброса, сбрасываем счетчик
-                    if last_reset:
-                        from datetime import date
-                        # Проверяем, что текущий месяц больше месяца последнего сброса
-                        if current_date.month != last_reset.month or current_date.year != last_reset.year:
-                            cur.execute("""
-                                UPDATE users
-                                SET characters_used = 0, usage_reset_date = CURRENT_DATE
-                                WHERE id = %s
-                            """, (user_id,))
-                            limit_was_reset = True
-                
-                # Генерируем название проекта из первых слов текста
-                title_words = text.split()[:5]
-                project_name = ' '.join(title_words) + ('...' if len(text.split()) > 5 else '')
-                
-                # Сохраняем проект
-                cur.execute("""
-                    INSERT INTO projects (user_id, name, text, audio_url, voice_id, voice_name, speed, pitch, format, character_count, duration, status)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (user_id, project_name, text, cdn_url, voice, voice, speed, 1.0, format_type, len(text), audio_duration, 'completed'))
-                
-                # Обновляем статистику пользователя
-                cur.execute("""
-                    INSERT INTO user_stats (user_id, total_generations, total_characters, total_projects, total_audio_duration)
-                    VALUES (%s, 1, %s, 1, %s)
-                    ON CONFLICT (user_id) DO UPDATE SET
-                        total_generations = user_stats.total_generations + 1,
-                        total_characters = user_stats.total_characters + %s,
-                        total_projects = user_stats.total_projects + 1,
-                        total_audio_duration = user_stats.total_audio_duration + %s
-                """, (user_id, len(text), audio_duration, len(text), audio_duration))
-                
-                # Обновляем использованные символы пользователя
-                cur.execute("""
-                    UPDATE users 
-                    SET characters_used = characters_used + %s
-                    WHERE id = %s
-                """, (len(text), user_id))
-                
-                conn.commit()
-                cur.close()
-                conn.close()
-            except Exception as db_error:
-                print(f'Database error: {db_error}')
+                reservation = reserve_characters(user_id, total_chars, conn=conn)
+            except QuotaExceededError as e:
                 return {
-                    'statusCode': 500,
+                    'statusCode': 403,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
                     'body': json.dumps({
-                        'error': f'Ошибка сохранения: {str(db_error)}. Пожалуйста, обратитесь к администратору.'
+                        'error': str(e),
+                        'characters_used': e.characters_used,
+                        'character_limit': e.character_limit
                     }),
                     'isBase64Encoded': False
                 }
+            if reservation:
+                reserved = total_chars
+        
+        with lane(request_lane):
+            results = synthesize_batch(items)
+        succeeded = [result for result in results if result['status'] == 200]
+        
+        if user_id and succeeded:
+            items_by_index = {item['index']: item for item in items}
+            project_ids = record_generations(user_id, [
+                {**items_by_index[result['index']], 'audio_url': result['audio_url'], 'audio_duration': result['audio_duration']}
+                for result in succeeded
+            ], conn=conn)
+            for result, project_id in zip(succeeded, project_ids):
+                result['project_id'] = project_id
+        
+        # Символы остаются списанными только за озвученные элементы
+        charged = sum(result['character_count'] for result in succeeded)
+        if reserved:
+            reserved -= charged
+        
+        results.extend({'index': index, 'status': 400, 'error': error} for index, error in errors.items())
+        results.sort(key=lambda result: result['index'])
         
         return {
             'statusCode': 200,
@@ -324,16 +518,14 @@ def handler(event: dict, context) -> dict:
                 'Access-Control-Allow-Origin': '*'
             },
             'body': json.dumps({
-                'audio_url': cdn_url,
-                'format': format_type,
-                'character_count': len(text),
-                'voice': voice,
-                'audio_duration': audio_duration,
-                'limit_reset': limit_was_reset
+                'results': results,
+                'succeeded': len(succeeded),
+                'failed': len(results) - len(succeeded),
+                'character_count': charged
             }),
             'isBase64Encoded': False
         }
-        
+    
     except Exception as e:
         return {
             'statusCode': 500,
@@ -345,4 +537,125 @@ def handler(event: dict, context) -> dict:
                 'error': f'Внутренняя ошибка: {str(e)}'
             }),
             'isBase64Encoded': False
-        }
\ No newline at end of file
+        }
+    finally:
+        if reserved:
+            try:
+                refund_characters(user_id, reserved, conn=conn)
+            except Exception as refund_error:
+                print(f'Quota refund error: {refund_error}')
+        if conn is not None:
+            conn.close()
+
+
+def preview_response(text: str, voice: str, speed, format_type: str, lang: str = None) -> dict:
+    """Синтезирует первый фрагмент текста для прослушивания; предпросмотр идёт в приоритетной полосе"""
+    try:
+        with lane(LANE_HIGH):
+            result = synthesize_preview(text, voice, speed, format_type, lang)
+    except CircuitOpenError as e:
+        return circuit_open_response(e)
+    except ConfigurationError as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': str(e)}),
+            'isBase64Encoded': False
+        }
+    except SpeechKitError as e:
+        return {
+            'statusCode': e.status_code,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': f'Ошибка Yandex API: {e.message}'}),
+            'isBase64Encoded': False
+        }
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({
+            'audio_url': result['audio_url'],
+            'format': format_type,
+            'character_count': len(text),
+            'preview_character_count': result['preview_character_count'],
+            'voice': voice,
+            'audio_duration': result['audio_duration'],
+            'preview': True,
+            'cached': result['cached']
+        }),
+        'isBase64Encoded': False
+    }
+
+
+def circuit_open_response(error: CircuitOpenError) -> dict:
+    """Быстрый отказ, пока выключатель SpeechKit разомкнут"""
+    return {
+        'statusCode': 503,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Retry-After': str(error.retry_after)
+        },
+        'body': json.dumps({'error': str(error), 'retry_after': error.retry_after}),
+        'isBase64Encoded': False
+    }
+
+
+def get_job_status(event: dict) -> dict:
+    """Возвращает прогресс асинхронного задания и ссылку на готовое аудио"""
+    query_params = event.get('queryStringParameters') or {}
+    job_id = query_params.get('jobId')
+    
+    if not job_id:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'jobId обязателен'}),
+            'isBase64Encoded': False
+        }
+    
+    try:
+        job = get_job(job_id)
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': f'Внутренняя ошибка: {str(e)}'}),
+            'isBase64Encoded': False
+        }
+    
+    if not job:
+        return {
+            'statusCode': 404,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Задание не найдено'}),
+            'isBase64Encoded': False
+        }
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(job),
+        'isBase64Encoded': False
+    }
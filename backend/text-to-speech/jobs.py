@@ -0,0 +1,354 @@
+"""Модуль для асинхронных заданий синтеза длинных текстов"""
+import os
+import time
+import uuid
+import http_client
+import circuit_breaker
+from db import get_db_connection
+from segments import synthesize_segments
+from speechkit import SpeechKitError, get_max_workers
+from splitter import split_text
+from synthesis import (
+    synthesize_text, get_speechkit_credentials, build_synthesis_params, SAMPLE_RATE, CHUNK_MAX_CHARS
+)
+from usage import record_generation
+from quota import refund_characters, get_user_plan
+from rate_limit import lane, plan_lane, LANE_BULK
+from playlist import PlaylistWriter, get_playlist_urls
+
+# Максимальная длина текста для асинхронного синтеза
+JOB_MAX_CHARS = 1000000
+
+# Задание в статусе processing дольше этого срока считается брошенным
+STALE_JOB_MINUTES = 15
+MAX_ATTEMPTS = 3
+
+# Бюджет времени одного вызова воркера; должен быть меньше таймаута функции.
+# Задание, не уложившееся в бюджет, возвращается в очередь
+DEFAULT_WORKER_BUDGET = 240
+
+# Прогресс пишется в БД не чаще, чем раз в столько процентов
+PROGRESS_STEP = 5
+
+
+class JobDeadlineExceeded(Exception):
+    """Бюджет времени вызова воркера истёк посреди задания"""
+
+
+def enqueue_job(user_id, text: str, voice: str, speed, format_type: str, playlist: bool = False,
+                lang: str = None) -> str:
+    """
+    Ставит задание в очередь и возвращает его идентификатор.
+    При playlist до ответа публикуются первые фрагменты (см. publish_playlist_head),
+    чтобы плеер начал воспроизведение, не дожидаясь запуска воркера.
+    """
+    job_id = str(uuid.uuid4())
+    if playlist:
+        publish_playlist_head(job_id, text, voice, speed, format_type, lang)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            INSERT INTO tts_jobs (id, user_id, text, voice, speed, format, status, playlist, lang)
+            VALUES (%s, %s, %s, %s, %s, %s, 'queued', %s, %s)
+        """, (job_id, user_id, text, voice, speed, format_type, playlist, lang))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+    return job_id
+
+
+def publish_playlist_head(job_id: str, text: str, voice: str, speed, format_type: str, lang: str = None):
+    """
+    Создаёт плейлист и синтезирует в него первые фрагменты параллельно, за время
+    одного фрагмента. Фрагменты попадают в кэш фрагментов, и задание потом их
+    переиспользует. Ошибка синтеза не мешает заданию: плейлист остаётся пустым.
+    """
+    writer = PlaylistWriter(job_id, format_type, int(SAMPLE_RATE))
+    writer.write(complete=False)
+
+    try:
+        api_key, folder_id = get_speechkit_credentials()
+        head = split_text(text, max_chars=CHUNK_MAX_CHARS)[:get_max_workers()]
+        params = build_synthesis_params(voice, speed, format_type, folder_id, lang=lang)
+        synthesize_segments(head, params, api_key, format_type, on_segment=writer.add)
+    except Exception as e:
+        print(f'Job {job_id} playlist head error: {e}')
+
+
+def get_job(job_id: str) -> dict:
+    """Возвращает состояние задания или None"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            SELECT id, status, segments_total, segments_done, audio_url, audio_duration, error, created_at, completed_at,
+                   format, playlist
+            FROM tts_jobs
+            WHERE id = %s
+        """, (job_id,))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+    if not row:
+        return None
+
+    status = row[1]
+    segments_total = row[2] or 0
+    segments_done = row[3] or 0
+    if status == 'completed':
+        progress = 100
+    elif segments_total:
+        progress = int(segments_done * 100 / segments_total)
+    else:
+        progress = 0
+
+    return {
+        'job_id': row[0],
+        'status': status,
+        'progress': progress,
+        'segments_total': segments_total,
+        'segments_done': segments_done,
+        'audio_url': row[4],
+        'audio_duration': row[5],
+        'error': row[6],
+        'created_at': row[7].isoformat() if row[7] else None,
+        'completed_at': row[8].isoformat() if row[8] else None,
+        'playlist': get_playlist_urls(row[0], row[9]) if row[10] else None
+    }
+
+
+def claim_job() -> dict:
+    """
+    Забирает следующее задание из очереди. FOR UPDATE SKIP LOCKED позволяет
+    нескольким экземплярам функции разбирать очередь, не блокируя друг друга.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            UPDATE tts_jobs
+            SET status = 'processing', attempts = attempts + 1, locked_at = NOW(), updated_at = NOW()
+            WHERE id = (
+                SELECT id FROM tts_jobs
+                WHERE status = 'queued'
+                   OR (status = 'processing' AND attempts < %s
+                       AND locked_at < NOW() - %s * INTERVAL '1 minute')
+                ORDER BY created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id, user_id, text, voice, speed, format, attempts, playlist, lang
+        """, (MAX_ATTEMPTS, STALE_JOB_MINUTES))
+        row = cur.fetchone()
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+    if not row:
+        return None
+
+    return {
+        'id': row[0],
+        'user_id': row[1],
+        'text': row[2],
+        'voice': row[3],
+        'speed': float(row[4]),
+        'format': row[5],
+        'attempts': row[6],
+        'playlist': bool(row[7]),
+        'lang': row[8]
+    }
+
+
+def release_quota(job: dict):
+    """Возвращает символы, зарезервированные при постановке задания в очередь"""
+    if not job['user_id']:
+        return
+    try:
+        refund_characters(job['user_id'], len(job['text']))
+    except Exception as refund_error:
+        print(f'Job {job["id"]} quota refund error: {refund_error}')
+
+
+def fail_stale_jobs() -> int:
+    """
+    Проваливает брошенные задания, у которых закончились попытки, и возвращает
+    их символы: claim_job такие задания больше не забирает.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            UPDATE tts_jobs
+            SET status = 'failed', error = 'Превышено число попыток', updated_at = NOW(), completed_at = NOW()
+            WHERE status = 'processing' AND attempts >= %s
+              AND locked_at < NOW() - %s * INTERVAL '1 minute'
+            RETURNING id, user_id, text
+        """, (MAX_ATTEMPTS, STALE_JOB_MINUTES))
+        rows = cur.fetchall()
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+    for row in rows:
+        release_quota({'id': row[0], 'user_id': row[1], 'text': row[2]})
+
+    return len(rows)
+
+
+def requeue_job(job_id: str):
+    """
+    Возвращает задание в очередь, не расходуя попытку: задание не провалилось,
+    а не уложилось в вызов. Готовые фрагменты уже в кэше, следующий вызов продолжит с них.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            UPDATE tts_jobs
+            SET status = 'queued', attempts = GREATEST(attempts - 1, 0), locked_at = NULL, updated_at = NOW()
+            WHERE id = %s
+        """, (job_id,))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def finish_job(job_id: str, status: str, audio_url: str = None, audio_duration: int = None, error: str = None):
+    """Записывает итог задания"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            UPDATE tts_jobs
+            SET status = %s, audio_url = %s, audio_duration = %s, error = %s, updated_at = NOW(),
+                completed_at = CASE WHEN %s IN ('completed', 'failed') THEN NOW() ELSE NULL END
+            WHERE id = %s
+        """, (status, audio_url, audio_duration, error, status, job_id))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def process_job(job: dict, deadline: float = None):
+    """
+    Синтезирует текст задания, сохраняя прогресс по мере готовности фрагментов.
+    deadline — момент time.monotonic(), после которого задание возвращается в очередь.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    last_reported = [-PROGRESS_STEP]
+
+    def on_progress(done, total):
+        if deadline is not None and done != total and time.monotonic() > deadline:
+            raise JobDeadlineExceeded(f'Задание не уложилось в вызов воркера: готово {done} из {total} фрагментов')
+        percent = done * 100 // total
+        if percent - last_reported[0] < PROGRESS_STEP and done != total:
+            return
+        last_reported[0] = percent
+        cur.execute("""
+            UPDATE tts_jobs
+            SET segments_done = %s, segments_total = %s, locked_at = NOW(), updated_at = NOW()
+            WHERE id = %s
+        """, (done, total, job['id']))
+        conn.commit()
+
+    # Плейлист перезаписывается после каждого готового фрагмента
+    writer = PlaylistWriter(job['id'], job['format'], int(SAMPLE_RATE)) if job['playlist'] else None
+
+    try:
+        # Фоновые задания уступают синхронным запросам, кроме безлимитного тарифа
+        plan = get_user_plan(job['user_id'], conn=conn) if job['user_id'] else None
+        job_lane = plan_lane(plan['role'], plan['plan'], default=LANE_BULK) if plan else LANE_BULK
+        with lane(job_lane):
+            result = synthesize_text(
+                job['text'], job['voice'], job['speed'], job['format'],
+                user_id=job['user_id'], on_progress=on_progress,
+                on_segment=writer.add if writer else None, lang=job['lang']
+            )
+        if writer:
+            if result['segments'] is None:
+                writer.add_file(result['audio_url'], result['audio_duration'])
+            writer.write(complete=True, audio_url=result['audio_url'])
+    except JobDeadlineExceeded as e:
+        requeue_job(job['id'])
+        print(f'Job {job["id"]} requeued: {e}')
+        return
+    except Exception as e:
+        # Временные ошибки SpeechKit возвращают задание в очередь;
+        # при разомкнутом выключателе задание не проваливается, а ждёт восстановления API
+        retry = isinstance(e, SpeechKitError) and (e.status_code == 429 or e.status_code >= 500)
+        if isinstance(e, circuit_breaker.CircuitOpenError):
+            finish_job(job['id'], 'queued', error=str(e))
+        elif retry and job['attempts'] < MAX_ATTEMPTS:
+            finish_job(job['id'], 'queued', error=str(e))
+        else:
+            finish_job(job['id'], 'failed', error=str(e))
+            release_quota(job)
+        print(f'Job {job["id"]} error: {e}')
+        return
+    finally:
+        cur.close()
+        conn.close()
+
+    if job['user_id']:
+        try:
+            usage = record_generation(
+                job['user_id'], job['text'], result['audio_url'], job['voice'],
+                job['speed'], job['format'], result['audio_duration']
+            )
+            if usage['duplicate']:
+                release_quota(job)
+        except Exception as db_error:
+            print(f'Job {job["id"]} database error: {db_error}')
+            finish_job(job['id'], 'failed', audio_url=result['audio_url'], error=f'Ошибка сохранения: {db_error}')
+            release_quota(job)
+            return
+
+    finish_job(job['id'], 'completed', audio_url=result['audio_url'], audio_duration=result['audio_duration'])
+
+
+def run_worker(budget_seconds: float = None) -> dict:
+    """Обрабатывает задания из очереди, пока не истечёт бюджет времени"""
+    if budget_seconds is None:
+        try:
+            budget_seconds = float(os.environ.get('TTS_WORKER_BUDGET_SEC', DEFAULT_WORKER_BUDGET))
+        except ValueError:
+            budget_seconds = DEFAULT_WORKER_BUDGET
+
+    deadline = time.monotonic() + budget_seconds
+    processed = 0
+
+    try:
+        failed = fail_stale_jobs()
+    except Exception as db_error:
+        print(f'Stale jobs sweep error: {db_error}')
+        failed = 0
+
+    while time.monotonic() < deadline:
+        # Пока SpeechKit недоступен, задания остаются в очереди до следующего запуска
+        if circuit_breaker.is_open('speechkit'):
+            break
+        job = claim_job()
+        if not job:
+            break
+        process_job(job, deadline=deadline)
+        processed += 1
+
+    return {'processed': processed, 'failed_stale': failed, 'http': http_client.get_stats()}
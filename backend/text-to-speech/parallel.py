@@ -0,0 +1,66 @@
+"""Модуль для параллельного выполнения задач с сохранением порядка результатов"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError, FIRST_COMPLETED, wait
+
+
+def ordered_map(func, items, max_workers: int, on_result=None, window: int = None) -> list:
+    """
+    Выполняет func для каждого элемента в пуле потоков; задачи видят контекст
+    вызывающего потока (contextvars), например полосу приоритета rate_limit.
+    Результаты отдаются строго в исходном порядке: либо списком, либо через
+    on_result(index, result) по мере готовности очередного элемента.
+    При первой ошибке оставшиеся задачи отменяются, а ошибка пробрасывается.
+    window ограничивает число задач, запущенных впереди ещё не отданного результата.
+    """
+    items = list(items)
+    total = len(items)
+    if total == 0:
+        return []
+
+    workers = max(1, min(max_workers, total))
+    if on_result is None:
+        window = total
+    else:
+        window = max(workers, window or workers * 2)
+
+    cancelled = threading.Event()
+
+    def run(index):
+        # Задачи, которые не успели стартовать до ошибки, не ходят во внешние API
+        if cancelled.is_set():
+            raise CancelledError()
+        return func(items[index])
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = {}
+    ready = {}
+    results = [] if on_result is None else None
+    submitted = 0
+    next_index = 0
+
+    try:
+        while next_index < total:
+            while submitted < total and submitted - next_index < window:
+                pending[executor.submit(contextvars.copy_context().run, run, submitted)] = submitted
+                submitted += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                ready[index] = future.result()
+
+            while next_index in ready:
+                result = ready.pop(next_index)
+                if on_result is None:
+                    results.append(result)
+                else:
+                    on_result(next_index, result)
+                next_index += 1
+    except BaseException:
+        cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+
+    executor.shutdown(wait=True)
+    return results
@@ -0,0 +1,130 @@
+"""Модуль конвейера «перевести и озвучить»: перевод каждого фрагмента сразу уходит в синтез"""
+import os
+from audio import get_stitcher
+from glossary import get_glossary
+from parallel import ordered_map
+from segments import synthesize_segments
+from speechkit import get_max_workers
+from splitter import split_text
+from storage import StreamingUpload, get_cdn_url
+from synthesis import (
+    SAMPLE_RATE, CHUNK_MAX_CHARS, ConfigurationError, get_speechkit_credentials,
+    build_synthesis_params, build_file_key, estimate_duration, voice_lang
+)
+from translation_memory import join_paragraphs
+from translator import split_document, translate_document
+from yandex_translate import detect_language
+
+# Голос по умолчанию и язык SpeechKit для языка перевода
+LANGUAGE_VOICES = {
+    'ru': ('alena', 'ru-RU'),
+    'en': ('john', 'en-US'),
+    'de': ('lea', 'de-DE'),
+    'kk': ('madi', 'kk-KK'),
+    'uz': ('nigora', 'uz-UZ')
+}
+
+# Фрагмент исходного текста: его перевод обычно укладывается в один запрос к SpeechKit
+PIPELINE_SEGMENT_CHARS = 400
+
+
+def get_translate_api_key() -> str:
+    """Возвращает ключ Yandex Translate или бросает ConfigurationError"""
+    api_key = os.environ.get('YANDEX_TRANSLATE_API_KEY')
+    if not api_key:
+        raise ConfigurationError('API ключ Yandex Translate не настроен')
+    return api_key
+
+
+def default_voice(target_language: str) -> str:
+    """Голос по умолчанию для языка перевода; None, если язык не озвучивается"""
+    voice = LANGUAGE_VOICES.get(target_language)
+    return voice[0] if voice else None
+
+
+def voice_speaks(voice_input: str, target_language: str) -> bool:
+    """Озвучивает ли голос язык перевода; голоса без языка в VOICE_LANGS — русские"""
+    return (voice_lang(voice_input) or 'ru-RU') == LANGUAGE_VOICES[target_language][1]
+
+
+def translate_and_speak(text: str, target_language: str, source_language: str, voice: str, speed,
+                        format_type: str, technical: bool = False, user_id=None) -> dict:
+    """
+    Переводит текст по фрагментам и озвучивает каждый перевод, как только он готов.
+    Фрагменты идут параллельно: пока один переводится, предыдущие уже синтезируются,
+    а готовое аудио склеивается по порядку и сразу уходит в хранилище.
+    Переводы берутся из памяти переводов, озвученные фрагменты — из кэша фрагментов.
+    """
+    translate_key = get_translate_api_key()
+    api_key, folder_id = get_speechkit_credentials()
+    params = build_synthesis_params(voice, speed, format_type, folder_id, lang=LANGUAGE_VOICES[target_language][1])
+
+    # Язык источника определяется один раз, а не в каждом фрагменте
+    if source_language == 'auto':
+        try:
+            source_language = detect_language(text, translate_key) or 'auto'
+        except Exception as detect_error:
+            print(f'Language detection error: {detect_error}')
+
+    glossary = get_glossary(user_id) if technical else None
+    terms = glossary.find_terms(text) if glossary else None
+
+    segments, separators = split_document(text, max_chars=PIPELINE_SEGMENT_CHARS)
+
+    def produce(segment):
+        if not segment.strip():
+            return None, [], 0
+        translation = translate_document(segment, target_language, source_language, translate_key, glossary, terms)
+        chunks = split_text(translation['translated_text'], max_chars=CHUNK_MAX_CHARS)
+        if not chunks:
+            return translation, [], 0
+        audio_chunks, reused = synthesize_segments(chunks, params, api_key, format_type)
+        return translation, audio_chunks, reused
+
+    file_key = build_file_key(user_id, format_type)
+    stitcher = get_stitcher(format_type, int(SAMPLE_RATE))
+    upload = StreamingUpload(file_key, format_type, reserve_header=stitcher.needs_header)
+
+    translations = [None] * len(segments)
+    stats = {'chunks': 0, 'reused': 0}
+
+    def on_result(index, result):
+        translation, audio_chunks, reused = result
+        translations[index] = translation
+        for audio in audio_chunks:
+            upload.write_all(stitcher.feed(audio))
+        stats['chunks'] += len(audio_chunks)
+        stats['reused'] += reused
+
+    try:
+        ordered_map(produce, segments, get_max_workers(), on_result=on_result)
+        upload.write_all(stitcher.finish())
+        upload.complete(header=stitcher.header(upload.size))
+    except Exception:
+        upload.abort()
+        raise
+
+    translated_text = join_paragraphs(
+        [translation['translated_text'] if translation else segment for translation, segment in zip(translations, segments)],
+        separators
+    )
+    done = [translation for translation in translations if translation]
+
+    return {
+        'audio_url': get_cdn_url(file_key),
+        'audio_duration': int(round(stitcher.duration)) or estimate_duration(translated_text, speed),
+        'translated_text': translated_text,
+        'detected_language': next(
+            (translation['detected_language'] for translation in done if translation['detected_language']),
+            source_language
+        ),
+        'memory_hits': sum(translation['memory_hits'] for translation in done),
+        'memory_misses': sum(translation['memory_misses'] for translation in done),
+        'cached': False,
+        'coalesced': False,
+        'segments': {
+            'total': stats['chunks'],
+            'reused': stats['reused'],
+            'reuse_ratio': round(stats['reused'] / stats['chunks'], 3) if stats['chunks'] else 0
+        }
+    }
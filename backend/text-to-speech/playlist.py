@@ -0,0 +1,90 @@
+"""Модуль для плейлистов из фрагментов: воспроизведение до окончания синтеза"""
+import json
+import math
+from audio import get_audio_duration, build_wav_header
+from storage import upload_audio, upload_playlist, get_cdn_url
+
+# HLS проигрывает только MP3 (packed audio); для остальных форматов пишется JSON-плейлист
+HLS_FORMATS = {'mp3'}
+PLAYLIST_FORMATS = {'mp3', 'ogg', 'wav'}
+
+# EXT-X-TARGETDURATION не должен меняться в EVENT-плейлисте, поэтому берётся с запасом
+HLS_TARGET_DURATION = 60
+
+
+def playlist_base_key(job_id: str) -> str:
+    """Возвращает путь плейлиста задания без расширения"""
+    return f'voice/playlists/{job_id}'
+
+
+def get_playlist_urls(job_id: str, format_type: str) -> dict:
+    """Возвращает ссылки на JSON и, для MP3, на m3u8-плейлист задания"""
+    base = playlist_base_key(job_id)
+    return {
+        'json': get_cdn_url(f'{base}.json'),
+        'm3u8': get_cdn_url(f'{base}.m3u8') if format_type in HLS_FORMATS else None
+    }
+
+
+class PlaylistWriter:
+    """
+    Плейлист, который дописывается по мере готовности фрагментов.
+    Фрагменты берутся из кэша фрагментов в хранилище; если фрагмента там нет
+    или это сырой PCM без заголовка, он загружается рядом с плейлистом.
+    """
+
+    def __init__(self, job_id: str, format_type: str, sample_rate: int):
+        self.base_key = playlist_base_key(job_id)
+        self.format_type = format_type
+        self.sample_rate = sample_rate
+        self.segments = []
+        self.target_duration = HLS_TARGET_DURATION
+
+    def add(self, index: int, audio: bytes, s3_key: str = None):
+        """Добавляет готовый фрагмент и перезаписывает плейлист"""
+        if self.format_type == 'wav':
+            audio = build_wav_header(len(audio), self.sample_rate) + audio
+            s3_key = None
+        if s3_key is None:
+            s3_key = f'{self.base_key}/{index}.{self.format_type}'
+            upload_audio(s3_key, audio, self.format_type)
+
+        duration = get_audio_duration(self.format_type, audio, self.sample_rate)
+        self.target_duration = max(self.target_duration, math.ceil(duration))
+        self.segments.append({'url': get_cdn_url(s3_key), 'duration': round(duration, 3)})
+        self.write(complete=False)
+
+    def add_file(self, audio_url: str, audio_duration: float):
+        """Плейлист из одного готового файла, например при попадании в кэш"""
+        self.segments = [{'url': audio_url, 'duration': audio_duration}]
+        self.target_duration = max(self.target_duration, math.ceil(audio_duration or 0))
+
+    def write(self, complete: bool, audio_url: str = None):
+        """Загружает плейлист в хранилище; complete закрывает его для плееров"""
+        if self.format_type in HLS_FORMATS:
+            upload_playlist(f'{self.base_key}.m3u8', self.render_m3u8(complete), 'application/vnd.apple.mpegurl')
+        upload_playlist(f'{self.base_key}.json', self.render_json(complete, audio_url), 'application/json')
+
+    def render_m3u8(self, complete: bool) -> str:
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            f'#EXT-X-TARGETDURATION:{self.target_duration}',
+            '#EXT-X-MEDIA-SEQUENCE:0',
+            '#EXT-X-PLAYLIST-TYPE:EVENT'
+        ]
+        for segment in self.segments:
+            lines.append(f'#EXTINF:{segment["duration"]:.3f},')
+            lines.append(segment['url'])
+        if complete:
+            lines.append('#EXT-X-ENDLIST')
+        return '\n'.join(lines) + '\n'
+
+    def render_json(self, complete: bool, audio_url: str = None) -> str:
+        return json.dumps({
+            'format': self.format_type,
+            'complete': complete,
+            'audio_url': audio_url,
+            'duration': round(sum(segment['duration'] for segment in self.segments), 3),
+            'segments': self.segments
+        })
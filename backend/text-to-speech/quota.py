@@ -0,0 +1,148 @@
+"""Модуль для лимитов тарифов: резервирование символов до синтеза и возврат при ошибке"""
+from db import get_db_connection
+
+# Лимиты берутся из таблицы plans; администраторы работают по тарифу unlimited
+USER_PLAN_SQL = """
+    SELECT u.role,
+           u.plan,
+           COALESCE(p.character_limit, free.character_limit) AS character_limit,
+           COALESCE(p.max_request_chars, free.max_request_chars) AS max_request_chars
+    FROM users u
+    LEFT JOIN plans p ON p.code = CASE WHEN u.role = 'admin' THEN 'unlimited' ELSE COALESCE(u.plan, 'free') END
+    LEFT JOIN plans free ON free.code = 'free'
+    WHERE u.id = %s
+"""
+
+# Резерв проходит, только если символы помещаются в лимит; сброс месячного
+# счётчика выполняется тем же запросом
+RESERVE_SQL = """
+    WITH target AS (
+        SELECT u.id,
+               u.usage_reset_date IS NOT NULL
+               AND date_trunc('month', u.usage_reset_date) <> date_trunc('month', CURRENT_DATE) AS needs_reset,
+               COALESCE(p.character_limit, free.character_limit) AS character_limit
+        FROM users u
+        LEFT JOIN plans p ON p.code = CASE WHEN u.role = 'admin' THEN 'unlimited' ELSE COALESCE(u.plan, 'free') END
+        LEFT JOIN plans free ON free.code = 'free'
+        WHERE u.id = %(user_id)s
+        FOR UPDATE OF u
+    )
+    UPDATE users u
+    SET characters_used = CASE WHEN t.needs_reset THEN 0 ELSE COALESCE(u.characters_used, 0) END + %(chars)s,
+        usage_reset_date = CASE WHEN t.needs_reset THEN CURRENT_DATE ELSE u.usage_reset_date END
+    FROM target t
+    WHERE u.id = t.id
+      AND (t.character_limit < 0
+           OR CASE WHEN t.needs_reset THEN 0 ELSE COALESCE(u.characters_used, 0) END + %(chars)s <= t.character_limit)
+    RETURNING u.characters_used, t.character_limit, t.needs_reset
+"""
+
+
+class QuotaExceededError(Exception):
+    """Символов по тарифу не хватает для запроса"""
+
+    def __init__(self, characters_used: int, character_limit: int, requested: int):
+        super().__init__(
+            f'Превышен лимит символов по тарифу: использовано {characters_used} из {character_limit}, '
+            f'запрошено {requested}'
+        )
+        self.characters_used = characters_used
+        self.character_limit = character_limit
+        self.requested = requested
+
+
+def get_user_plan(user_id, conn=None) -> dict:
+    """Возвращает роль, тариф и лимиты пользователя или None"""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(USER_PLAN_SQL, (user_id,))
+        row = cur.fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if own_conn:
+            conn.close()
+
+    if not row:
+        return None
+
+    return {
+        'role': row[0],
+        'plan': row[1] or 'free',
+        'character_limit': row[2],
+        'max_request_chars': row[3]
+    }
+
+
+def reserve_characters(user_id, characters: int, conn=None) -> dict:
+    """
+    Атомарно резервирует символы до обращения к SpeechKit.
+    Бросает QuotaExceededError, если резерв не помещается в лимит тарифа,
+    и возвращает None, если пользователя нет.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(RESERVE_SQL, {'user_id': user_id, 'chars': characters})
+        row = cur.fetchone()
+        if not row:
+            cur.execute("""
+                SELECT COALESCE(u.characters_used, 0), COALESCE(p.character_limit, free.character_limit)
+                FROM users u
+                LEFT JOIN plans p ON p.code = CASE WHEN u.role = 'admin' THEN 'unlimited' ELSE COALESCE(u.plan, 'free') END
+                LEFT JOIN plans free ON free.code = 'free'
+                WHERE u.id = %s
+            """, (user_id,))
+            current = cur.fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if own_conn:
+            conn.close()
+
+    if not row:
+        if current is None:
+            return None
+        raise QuotaExceededError(current[0], current[1], characters)
+
+    return {
+        'characters_used': row[0],
+        'character_limit': row[1],
+        'limit_reset': row[2]
+    }
+
+
+def refund_characters(user_id, characters: int, conn=None):
+    """Возвращает зарезервированные символы, если синтез не состоялся"""
+    own_conn = conn is None or conn.closed
+    if own_conn:
+        conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            UPDATE users
+            SET characters_used = GREATEST(0, COALESCE(characters_used, 0) - %s)
+            WHERE id = %s
+        """, (characters, user_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if own_conn:
+            conn.close()
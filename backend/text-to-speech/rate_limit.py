@@ -0,0 +1,147 @@
+"""Модуль для ограничения частоты запросов к внешним API: общий token bucket в Postgres"""
+import contextvars
+import random
+import threading
+import time
+from contextlib import contextmanager
+from db import get_pooled_connection, release_connection
+
+# Полосы приоритета: high — безлимитный тариф, админы и предпросмотр,
+# normal — обычные запросы, bulk — фоновые задания бесплатных тарифов
+LANE_HIGH = 'high'
+LANE_NORMAL = 'normal'
+LANE_BULK = 'bulk'
+
+# Доля ёмкости корзины, ниже которой полоса не берёт токены:
+# остаток приберегается для более приоритетных полос
+LANE_FLOORS = {
+    LANE_HIGH: 0.0,
+    LANE_NORMAL: 0.2,
+    LANE_BULK: 0.5
+}
+
+# Токены берутся из БД пачкой и расходуются в памяти экземпляра,
+# неизрасходованные сгорают через LEASE_TTL секунд
+LEASE_SIZE = 4
+LEASE_TTL = 1.0
+
+# Сколько секунд запрос может ждать токен, прежде чем сдаться
+MAX_WAIT_SECONDS = 30
+MAX_SLEEP_SECONDS = 1.0
+
+# Остаток пополняется по прошедшему времени; берётся не больше, чем разрешает порог полосы
+TAKE_TOKENS_SQL = """
+    WITH bucket AS (
+        SELECT name, capacity, refill_per_sec,
+               LEAST(capacity, tokens + EXTRACT(EPOCH FROM clock_timestamp()::timestamp - updated_at) * refill_per_sec)
+                   AS available
+        FROM rate_limits
+        WHERE name = %(name)s
+        FOR UPDATE
+    ),
+    grant_tokens AS (
+        SELECT name, capacity, refill_per_sec, available,
+               GREATEST(0, LEAST(%(wanted)s, FLOOR(available - capacity * %(floor)s))) AS granted
+        FROM bucket
+    )
+    UPDATE rate_limits r
+    SET tokens = g.available - g.granted, updated_at = clock_timestamp()::timestamp
+    FROM grant_tokens g
+    WHERE r.name = g.name
+    RETURNING g.granted, g.available, g.capacity, g.refill_per_sec
+"""
+
+_lane = contextvars.ContextVar('rate_limit_lane', default=LANE_NORMAL)
+_leases = {}
+_leases_lock = threading.Lock()
+
+
+class RateLimitExceeded(Exception):
+    """Токен не получен за MAX_WAIT_SECONDS"""
+
+    def __init__(self, bucket: str, retry_after: float):
+        super().__init__(f'Превышена частота запросов к {bucket}, повторите через {retry_after:.0f} с')
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+
+@contextmanager
+def lane(name: str):
+    """Задаёт полосу приоритета для запросов внутри блока, включая потоки ordered_map"""
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def plan_lane(role: str, plan: str, default: str = LANE_NORMAL) -> str:
+    """Полоса по тарифу: безлимитный тариф и админы идут первыми"""
+    if role == 'admin' or plan == 'unlimited':
+        return LANE_HIGH
+    return default
+
+
+def _take_lease(bucket: str, lane_name: str) -> bool:
+    with _leases_lock:
+        lease = _leases.get((bucket, lane_name))
+        if lease and lease[0] > 0 and lease[1] > time.monotonic():
+            lease[0] -= 1
+            return True
+    return False
+
+
+def _take_from_db(bucket: str, lane_name: str) -> tuple:
+    """Берёт пачку токенов из общей корзины; возвращает (получено, секунд до следующей попытки)"""
+    floor = LANE_FLOORS.get(lane_name, LANE_FLOORS[LANE_NORMAL])
+    conn = get_pooled_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(TAKE_TOKENS_SQL, {'name': bucket, 'wanted': LEASE_SIZE, 'floor': floor})
+        row = cur.fetchone()
+        conn.commit()
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    # Корзина не настроена — не ограничиваем
+    if not row:
+        return LEASE_SIZE, 0.0
+
+    granted, available, capacity, refill_per_sec = int(row[0]), row[1], row[2], row[3]
+    if granted:
+        return granted, 0.0
+    if refill_per_sec <= 0:
+        return 0, MAX_SLEEP_SECONDS
+    deficit = capacity * floor + 1 - available
+    return 0, max(0.05, deficit / refill_per_sec)
+
+
+def acquire(bucket: str, lane_name: str = None):
+    """
+    Ждёт токен на один запрос к внешнему API.
+    Сначала расходуется пачка, уже взятая экземпляром, затем общая корзина в БД.
+    Если БД недоступна, запрос пропускается без ограничения.
+    """
+    lane_name = lane_name or _lane.get()
+    deadline = time.monotonic() + MAX_WAIT_SECONDS
+
+    while True:
+        if _take_lease(bucket, lane_name):
+            return
+
+        try:
+            granted, wait = _take_from_db(bucket, lane_name)
+        except Exception as db_error:
+            print(f'Rate limiter error: {db_error}')
+            return
+
+        if granted:
+            with _leases_lock:
+                _leases[(bucket, lane_name)] = [granted - 1, time.monotonic() + LEASE_TTL]
+            return
+
+        if time.monotonic() + wait > deadline:
+            raise RateLimitExceeded(bucket, wait)
+        time.sleep(min(MAX_SLEEP_SECONDS, wait) * random.uniform(0.8, 1.2))
@@ -0,0 +1,96 @@
+"""Модуль для пофрагментного синтеза с переиспользованием готовых фрагментов"""
+import threading
+from cache import synthesis_cache_key, find_cached_segments, store_cached_segments
+from parallel import ordered_map
+from speechkit import synthesize_chunk, get_max_workers
+from storage import upload_audio, download_audio
+
+# Новые фрагменты записываются в кэш пачками по ходу синтеза: если вызов прервётся,
+# повтор задания продолжит с уже озвученных фрагментов
+SEGMENT_FLUSH_SIZE = 8
+
+
+def segment_s3_key(segment_key: str, format_type: str) -> str:
+    """Возвращает путь фрагмента в хранилище"""
+    return f'voice/segments/{segment_key}.{format_type}'
+
+
+def synthesize_segments(text_chunks: list, params: dict, api_key: str, format_type: str, on_chunk=None,
+                        on_segment=None) -> tuple:
+    """
+    Синтезирует фрагменты параллельно, переиспользуя ранее озвученные.
+    Готовые фрагменты скачиваются из хранилища, новые синтезируются и сохраняются.
+    params — общие параметры SpeechKit или список параметров для каждого фрагмента.
+    on_segment(index, audio, s3_key) вызывается по порядку после on_chunk;
+    s3_key равен None, если фрагмент не удалось сохранить в хранилище.
+    Возвращает (audio_chunks, reused_count); при on_chunk audio_chunks равен None.
+    """
+    chunk_params = params if isinstance(params, list) else [params] * len(text_chunks)
+    keys = [
+        synthesis_cache_key(chunk, item['voice'], item['speed'], format_type, item['sampleRateHertz'],
+                            lang=item.get('lang'))
+        for chunk, item in zip(text_chunks, chunk_params)
+    ]
+
+    try:
+        cached = find_cached_segments(keys)
+    except Exception as cache_error:
+        print(f'Segment cache lookup error: {cache_error}')
+        cached = {}
+
+    new_segments = []
+    new_segments_lock = threading.Lock()
+    reused = []
+    stored = {}
+
+    def flush_segments(force: bool = False):
+        with new_segments_lock:
+            if not new_segments or (not force and len(new_segments) < SEGMENT_FLUSH_SIZE):
+                return
+            batch = new_segments[:]
+            new_segments.clear()
+        try:
+            store_cached_segments(batch)
+        except Exception as cache_error:
+            print(f'Segment cache store error: {cache_error}')
+
+    def produce(index):
+        key = keys[index]
+        if key in cached:
+            try:
+                audio = download_audio(cached[key])
+                reused.append(index)
+                stored[index] = cached[key]
+                return audio
+            except Exception as cache_error:
+                print(f'Segment download error: {cache_error}')
+
+        audio = synthesize_chunk(text_chunks[index], chunk_params[index], api_key)
+        s3_key = segment_s3_key(key, format_type)
+        try:
+            upload_audio(s3_key, audio, format_type)
+            with new_segments_lock:
+                new_segments.append((key, s3_key, len(audio)))
+            stored[index] = s3_key
+        except Exception as cache_error:
+            print(f'Segment upload error: {cache_error}')
+            return audio
+        flush_segments()
+        return audio
+
+    def on_result(index, audio):
+        if on_chunk:
+            on_chunk(index, audio)
+        if on_segment:
+            on_segment(index, audio, stored.get(index))
+
+    try:
+        audio_chunks = ordered_map(
+            produce, range(len(text_chunks)), get_max_workers(),
+            on_result=on_result if on_chunk or on_segment else None
+        )
+    finally:
+        # Уже озвученные фрагменты сохраняются и при ошибке синтеза
+        flush_segments(force=True)
+
+    return audio_chunks, len(reused)
@@ -0,0 +1,86 @@
+"""Модуль для объединения одновременных одинаковых запросов синтеза"""
+import os
+import threading
+from contextlib import contextmanager
+from psycopg2 import errors
+from db import get_pooled_connection, release_connection, POOL_MAX_CONNECTIONS
+
+# Сколько секунд запрос ждёт синтеза, уже начатого другим запросом
+DEFAULT_WAIT_SECONDS = 20
+
+# Блокировки держат соединение всё время синтеза, поэтому занимают не больше половины пула:
+# синтезу под блокировкой всегда остаются соединения для кэша фрагментов
+LOCK_MAX_CONNECTIONS = max(1, POOL_MAX_CONNECTIONS // 2)
+
+_lock_slots = threading.BoundedSemaphore(LOCK_MAX_CONNECTIONS)
+
+
+def get_wait_seconds() -> float:
+    """Возвращает время ожидания из TTS_SINGLEFLIGHT_WAIT_SEC"""
+    try:
+        return max(0.0, float(os.environ.get('TTS_SINGLEFLIGHT_WAIT_SEC', DEFAULT_WAIT_SECONDS)))
+    except ValueError:
+        return DEFAULT_WAIT_SECONDS
+
+
+def advisory_lock_id(key: str) -> int:
+    """Переводит hex-ключ кэша в идентификатор advisory-блокировки (bigint)"""
+    return int(key[:15], 16)
+
+
+@contextmanager
+def synthesis_lock(key: str, wait_seconds: float = None):
+    """
+    Сессионная advisory-блокировка Postgres на ключ синтеза.
+    Первый запрос (лидер) получает её сразу, повторные ждут его завершения
+    и затем перепроверяют кэш. Отдаёт True, если блокировка взята,
+    и False, если ожидание истекло, БД недоступна или все соединения
+    для блокировок заняты: тогда синтез идёт без неё.
+    """
+    if wait_seconds is None:
+        wait_seconds = get_wait_seconds()
+    lock_id = advisory_lock_id(key)
+
+    if not _lock_slots.acquire(blocking=False):
+        print(f'Single-flight lock skipped for {key}: no free connections')
+        yield False
+        return
+
+    try:
+        conn = get_pooled_connection()
+    except Exception as db_error:
+        _lock_slots.release()
+        print(f'Single-flight lock error: {db_error}')
+        yield False
+        return
+
+    conn.autocommit = True
+    cur = conn.cursor()
+    locked = False
+
+    try:
+        try:
+            cur.execute("SELECT set_config('lock_timeout', %s, FALSE)", (f'{max(1, int(wait_seconds * 1000))}ms',))
+            cur.execute("SELECT pg_advisory_lock(%s)", (lock_id,))
+            locked = True
+        except errors.LockNotAvailable:
+            print(f'Single-flight wait timed out for {key}')
+        except Exception as db_error:
+            print(f'Single-flight lock error: {db_error}')
+
+        yield locked
+    finally:
+        try:
+            # Соединение вернётся в пул: блокировка и lock_timeout не должны пережить запрос
+            if locked:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (lock_id,))
+            cur.execute("RESET lock_timeout")
+            conn.autocommit = False
+        except Exception as db_error:
+            # Закрытое соединение пул не переиспользует, и сессионная блокировка снимается вместе с ним
+            print(f'Single-flight unlock error: {db_error}')
+            conn.close()
+        finally:
+            cur.close()
+            release_connection(conn)
+            _lock_slots.release()
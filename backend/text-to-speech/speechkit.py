@@ -0,0 +1,71 @@
+"""Модуль для синтеза речи через Yandex SpeechKit"""
+import os
+import http_client
+import circuit_breaker
+from parallel import ordered_map
+from rate_limit import acquire, RateLimitExceeded
+
+SPEECHKIT_URL = 'https://tts.api.cloud.yandex.net/speech/v1/tts:synthesize'
+
+# Количество одновременных запросов к SpeechKit в рамках одного вызова
+DEFAULT_MAX_WORKERS = 4
+
+
+class SpeechKitError(Exception):
+    """Ошибка ответа Yandex SpeechKit"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def get_max_workers() -> int:
+    """Возвращает число параллельных запросов из TTS_MAX_WORKERS"""
+    try:
+        return max(1, int(os.environ.get('TTS_MAX_WORKERS', DEFAULT_MAX_WORKERS)))
+    except ValueError:
+        return DEFAULT_MAX_WORKERS
+
+
+def synthesize_chunk(chunk: str, params: dict, api_key: str) -> bytes:
+    """Синтезирует один фрагмент текста и возвращает аудио"""
+    # Разомкнутый выключатель отказывает до ожидания токена и запроса к БД лимитов
+    circuit_breaker.check('speechkit')
+
+    # Общий для всех экземпляров лимит частоты: ждём токен вместо 429 посреди синтеза
+    try:
+        acquire('speechkit')
+    except RateLimitExceeded as e:
+        raise SpeechKitError(429, str(e))
+
+    # Пока SpeechKit деградирует, выключатель отказывает сразу, не дожидаясь таймаута
+    data = {'text': chunk, **params}
+    response = circuit_breaker.call(
+        'speechkit',
+        lambda: http_client.post(
+            SPEECHKIT_URL,
+            headers={'Authorization': f'Api-Key {api_key}'},
+            data=data,
+            timeout=(3.05, 10)
+        ),
+        is_failure=lambda result: result.status_code in http_client.RETRY_STATUSES
+    )
+
+    if response.status_code != 200:
+        raise SpeechKitError(response.status_code, response.text)
+
+    return response.content
+
+
+def synthesize_chunks(chunks: list, params: dict, api_key: str, max_workers: int = None, on_chunk=None) -> list:
+    """
+    Синтезирует фрагменты параллельно, сохраняя их порядок.
+    Первая ошибка отменяет ещё не начатые фрагменты.
+    """
+    return ordered_map(
+        lambda chunk: synthesize_chunk(chunk, params, api_key),
+        chunks,
+        max_workers or get_max_workers(),
+        on_result=on_chunk
+    )
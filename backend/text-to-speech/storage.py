@@ -0,0 +1,177 @@
+"""Модуль для работы с хранилищем аудиофайлов S3"""
+import os
+import boto3
+
+BUCKET = 'files'
+
+# Минимальный размер части multipart upload в S3 (кроме последней)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+CONTENT_TYPES = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'ogg': 'audio/ogg'
+}
+
+_s3_client = None
+
+
+def get_s3_client():
+    """Возвращает клиент S3, переиспользуемый между вызовами тёплого экземпляра"""
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client('s3',
+            endpoint_url='https://bucket.poehali.dev',
+            aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
+            aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY']
+        )
+    return _s3_client
+
+
+def get_cdn_url(file_key: str) -> str:
+    """Возвращает публичную ссылку на файл в хранилище"""
+    return f"https://cdn.poehali.dev/projects/{os.environ['AWS_ACCESS_KEY_ID']}/bucket/{file_key}"
+
+
+def get_file_key(cdn_url: str) -> str:
+    """Возвращает путь файла в хранилище по его публичной ссылке"""
+    prefix = get_cdn_url('')
+    return cdn_url[len(prefix):] if cdn_url.startswith(prefix) else None
+
+
+def upload_audio(file_key: str, audio_data: bytes, format_type: str):
+    """Загружает аудио в хранилище"""
+    get_s3_client().put_object(
+        Bucket=BUCKET,
+        Key=file_key,
+        Body=audio_data,
+        ContentType=CONTENT_TYPES.get(format_type, 'audio/mpeg')
+    )
+
+
+def upload_playlist(file_key: str, body: str, content_type: str):
+    """Загружает плейлист; он перезаписывается по мере синтеза, поэтому не кэшируется"""
+    get_s3_client().put_object(
+        Bucket=BUCKET,
+        Key=file_key,
+        Body=body.encode('utf-8'),
+        ContentType=content_type,
+        CacheControl='no-cache'
+    )
+
+
+def download_audio(file_key: str) -> bytes:
+    """Скачивает аудио из хранилища"""
+    response = get_s3_client().get_object(Bucket=BUCKET, Key=file_key)
+    return response['Body'].read()
+
+
+def iter_audio(file_key: str, chunk_size: int = 1024 * 1024):
+    """Читает аудио из хранилища частями, не загружая файл в память целиком"""
+    response = get_s3_client().get_object(Bucket=BUCKET, Key=file_key)
+    yield from response['Body'].iter_chunks(chunk_size)
+
+
+class StreamingUpload:
+    """
+    Потоковая загрузка аудио в хранилище частями (multipart upload).
+    Части отправляются по мере накопления part_size байт, поэтому в памяти
+    держится не больше одной части. Небольшие файлы загружаются одним запросом.
+    При reserve_header первая часть придерживается до complete(), чтобы
+    дописать перед ней заголовок, зависящий от итогового размера (WAV).
+    """
+
+    def __init__(self, file_key: str, format_type: str, part_size: int = MIN_PART_SIZE,
+                 reserve_header: bool = False):
+        self.file_key = file_key
+        self.content_type = CONTENT_TYPES.get(format_type, 'audio/mpeg')
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.reserve_header = reserve_header
+        self.upload_id = None
+        self.parts = []
+        self.size = 0
+        self._buffer = bytearray()
+        self._first_part = None
+
+    def write(self, data: bytes):
+        """Добавляет данные и отправляет накопленную часть, если она заполнена"""
+        self._buffer += data
+        self.size += len(data)
+        if len(self._buffer) >= self.part_size:
+            if self.reserve_header and self._first_part is None:
+                self._first_part = self._buffer
+                self._buffer = bytearray()
+            else:
+                self._upload_part()
+
+    def write_all(self, pieces: list):
+        """Добавляет несколько фрагментов данных по порядку"""
+        for piece in pieces:
+            self.write(piece)
+
+    def _upload_part(self, part_number: int = None, body: bytes = None):
+        s3 = get_s3_client()
+        if self.upload_id is None:
+            response = s3.create_multipart_upload(
+                Bucket=BUCKET,
+                Key=self.file_key,
+                ContentType=self.content_type
+            )
+            self.upload_id = response['UploadId']
+
+        if body is None:
+            # Номер 1 зарезервирован под часть с заголовком
+            part_number = len(self.parts) + (2 if self.reserve_header else 1)
+            body = bytes(self._buffer)
+            self._buffer = bytearray()
+
+        response = s3.upload_part(
+            Bucket=BUCKET,
+            Key=self.file_key,
+            PartNumber=part_number,
+            UploadId=self.upload_id,
+            Body=body
+        )
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+
+    def complete(self, header: bytes = b''):
+        """Завершает загрузку, при необходимости дописывая заголовок в начало файла"""
+        first_part = self._first_part or bytearray()
+        self._first_part = None
+
+        if self.upload_id is None and not (first_part and self._buffer):
+            get_s3_client().put_object(
+                Bucket=BUCKET,
+                Key=self.file_key,
+                Body=header + bytes(first_part) + bytes(self._buffer),
+                ContentType=self.content_type
+            )
+            self._buffer = bytearray()
+            return
+
+        if self._buffer:
+            self._upload_part()
+        if self.reserve_header:
+            self._upload_part(part_number=1, body=header + bytes(first_part))
+
+        get_s3_client().complete_multipart_upload(
+            Bucket=BUCKET,
+            Key=self.file_key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': sorted(self.parts, key=lambda part: part['PartNumber'])}
+        )
+
+    def abort(self):
+        """Отменяет незавершённую загрузку, чтобы не оставлять части в хранилище"""
+        if self.upload_id is None:
+            return
+
+        try:
+            get_s3_client().abort_multipart_upload(
+                Bucket=BUCKET,
+                Key=self.file_key,
+                UploadId=self.upload_id
+            )
+        except Exception as abort_error:
+            print(f'Multipart abort error: {abort_error}')
+        self.upload_id = None
@@ -0,0 +1,268 @@
+"""Модуль для синтеза текста целиком: разбиение, кэш, склейка и загрузка в хранилище"""
+import os
+import uuid
+from datetime import datetime
+from audio import get_stitcher
+from cache import synthesis_cache_key, get_cached_synthesis, store_cached_synthesis
+from segments import synthesize_segments
+from singleflight import synthesis_lock
+from splitter import split_text
+from storage import StreamingUpload, get_cdn_url, get_file_key, iter_audio
+from encoder import can_encode, encode_wav_stream
+
+# Маппинг имён голосов на реальные идентификаторы Yandex API
+VOICE_MAP = {
+    # Бесплатные голоса (русский)
+    'alena': 'alena',
+    'filipp': 'filipp',
+    'ermil': 'ermil',
+    'jane': 'jane',
+    'omazh': 'omazh',
+    'zahar': 'zahar',
+    # Премиум нейронные голоса (русский)
+    'alena_premium': 'alena',
+    'filipp_premium': 'filipp',
+    # Английский
+    'john': 'john',
+    'jane-en': 'jane',
+    'madirus': 'madirus',
+    # Другие языки
+    'lea': 'lea',
+    'bruno': 'bruno',
+    'amira': 'amira',
+    'nigora': 'nigora',
+    'madi': 'madi',
+    'aylin': 'aylin'
+}
+
+# Язык SpeechKit для нерусских голосов; без lang API синтезирует как ru-RU
+VOICE_LANGS = {
+    'john': 'en-US',
+    'jane-en': 'en-US',
+    'lea': 'de-DE',
+    'amira': 'kk-KK',
+    'madi': 'kk-KK',
+    'nigora': 'uz-UZ'
+}
+
+FORMAT_MAP = {
+    'mp3': 'mp3',
+    'wav': 'lpcm',
+    'ogg': 'oggopus'
+}
+
+SAMPLE_RATE = '48000'
+CHUNK_MAX_CHARS = 500
+
+
+class ConfigurationError(Exception):
+    """Не заданы переменные окружения для SpeechKit"""
+
+
+def resolve_voice(voice_input: str) -> str:
+    """Возвращает идентификатор голоса Yandex API"""
+    return VOICE_MAP.get(voice_input, voice_input)
+
+
+def voice_lang(voice_input: str) -> str:
+    """Возвращает язык SpeechKit для голоса; None для русских голосов"""
+    return VOICE_LANGS.get(voice_input)
+
+
+def get_speechkit_credentials() -> tuple:
+    """Возвращает (api_key, folder_id) или бросает ConfigurationError"""
+    api_key = os.environ.get('YANDEX_SPEECHKIT_API_KEY')
+    folder_id = os.environ.get('YANDEX_FOLDER_ID')
+
+    if not api_key:
+        raise ConfigurationError('API ключ Yandex SpeechKit не настроен')
+    if not folder_id:
+        raise ConfigurationError('YANDEX_FOLDER_ID не настроен')
+
+    return api_key, folder_id
+
+
+def build_synthesis_params(voice: str, speed, format_type: str, folder_id: str, lang: str = None) -> dict:
+    """Возвращает параметры запроса к SpeechKit; lang задаётся для нерусских текстов"""
+    params = {
+        'voice': voice,
+        'speed': str(speed),
+        'format': FORMAT_MAP.get(format_type, 'mp3'),
+        'sampleRateHertz': SAMPLE_RATE,
+        'folderId': folder_id
+    }
+    if lang:
+        params['lang'] = lang
+    return params
+
+
+def build_file_key(user_id, format_type: str) -> str:
+    """Возвращает путь нового аудиофайла пользователя в хранилище"""
+    file_id = str(uuid.uuid4())
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return f'voice/{user_id or "anonymous"}/{timestamp}_{file_id}.{format_type}'
+
+
+def estimate_duration(text: str, speed) -> int:
+    """Примерная длительность аудио: 150 слов в минуту = 2.5 слова в секунду"""
+    word_count = len(text.split())
+    return int((word_count / 2.5) / float(speed))
+
+
+def lookup_cached_synthesis(cache_key: str) -> dict:
+    """Ищет готовый синтез в кэше; ошибка кэша не мешает синтезу"""
+    try:
+        cached = get_cached_synthesis(cache_key)
+    except Exception as cache_error:
+        print(f'Cache lookup error: {cache_error}')
+        return None
+
+    if not cached:
+        return None
+
+    return {
+        'audio_url': cached['audio_url'],
+        'audio_duration': cached['audio_duration'],
+        'cached': True,
+        'coalesced': False,
+        'segments': None
+    }
+
+
+def keep_master_enabled() -> bool:
+    """Хранить ли PCM-мастер по умолчанию (TTS_KEEP_PCM_MASTER=1)"""
+    return os.environ.get('TTS_KEEP_PCM_MASTER', '').lower() in ('1', 'true', 'yes')
+
+
+def synthesize_text(text: str, voice: str, speed, format_type: str, user_id=None, on_progress=None,
+                    on_segment=None, keep_master: bool = False, lang: str = None) -> dict:
+    """
+    Синтезирует текст и загружает результат в хранилище.
+    Готовый синтез с теми же параметрами отдаётся из кэша без обращения к Yandex и S3.
+    Одинаковые одновременные запросы ждут первый и берут его результат из кэша.
+    on_progress(done, total) вызывается по мере готовности фрагментов,
+    on_segment(index, audio, s3_key) — с самим фрагментом (см. synthesize_segments).
+    Сжатый формат кодируется локально из готового WAV (PCM-мастера), если он есть;
+    при keep_master мастер синтезируется, чтобы следующие форматы не требовали SpeechKit.
+    lang — язык SpeechKit из voice_lang по имени голоса, которое прислал клиент.
+    """
+    cache_key = synthesis_cache_key(text, voice, speed, format_type, SAMPLE_RATE, lang)
+    cached = lookup_cached_synthesis(cache_key)
+    if cached:
+        return cached
+
+    with synthesis_lock(cache_key) as locked:
+        # Пока ждали блокировку, такой же запрос мог закончить синтез
+        if locked:
+            cached = lookup_cached_synthesis(cache_key)
+            if cached:
+                cached['coalesced'] = True
+                return cached
+
+        if format_type != 'wav' and can_encode(format_type):
+            master = lookup_cached_synthesis(synthesis_cache_key(text, voice, speed, 'wav', SAMPLE_RATE, lang))
+            if master is None and (keep_master or keep_master_enabled()):
+                master = synthesize_text(text, voice, speed, 'wav', user_id=user_id, on_progress=on_progress,
+                                         lang=lang)
+            if master and get_file_key(master['audio_url']):
+                return derive_from_master(cache_key, master, text, voice, speed, format_type, user_id)
+
+        return synthesize_uncached(cache_key, text, voice, speed, format_type, user_id, on_progress, on_segment,
+                                   lang)
+
+
+def synthesize_preview(text: str, voice: str, speed, format_type: str, lang: str = None) -> dict:
+    """
+    Синтезирует только первый фрагмент текста для прослушивания голоса и скорости.
+    Фрагмент совпадает с первым фрагментом полного синтеза, поэтому попадает
+    в кэш фрагментов и переиспользуется, когда пользователь озвучит текст целиком.
+    """
+    preview = split_text(text, max_chars=CHUNK_MAX_CHARS)[0]
+    result = synthesize_text(preview, voice, speed, format_type, lang=lang)
+    result['preview_character_count'] = len(preview)
+    return result
+
+
+def derive_from_master(cache_key: str, master: dict, text: str, voice: str, speed, format_type: str,
+                       user_id=None) -> dict:
+    """Кодирует WAV-мастер в нужный формат потоком, без обращения к SpeechKit"""
+    file_key = build_file_key(user_id, format_type)
+    upload = StreamingUpload(file_key, format_type)
+
+    try:
+        pieces = encode_wav_stream(format_type, iter_audio(get_file_key(master['audio_url'])), int(SAMPLE_RATE))
+        upload.write_all(pieces)
+        upload.complete()
+    except Exception:
+        upload.abort()
+        raise
+
+    cdn_url = get_cdn_url(file_key)
+    audio_duration = master['audio_duration']
+
+    try:
+        store_cached_synthesis(cache_key, cdn_url, voice, speed, format_type, len(text), audio_duration)
+    except Exception as cache_error:
+        print(f'Cache store error: {cache_error}')
+
+    return {
+        'audio_url': cdn_url,
+        'audio_duration': audio_duration,
+        'cached': False,
+        'coalesced': False,
+        'segments': None
+    }
+
+
+def synthesize_uncached(cache_key: str, text: str, voice: str, speed, format_type: str, user_id=None,
+                        on_progress=None, on_segment=None, lang: str = None) -> dict:
+    """Синтезирует текст через SpeechKit, склеивает части и сохраняет результат в кэш"""
+    api_key, folder_id = get_speechkit_credentials()
+
+    text_chunks = split_text(text, max_chars=CHUNK_MAX_CHARS)
+    synthesis_params = build_synthesis_params(voice, speed, format_type, folder_id, lang=lang)
+
+    file_key = build_file_key(user_id, format_type)
+
+    # Синтезируем части параллельно, ранее озвученные фрагменты берём из кэша.
+    # Готовые части сразу уходят в хранилище, пока синтезируются следующие.
+    # Склейка учитывает контейнер: общий заголовок WAV, сквозные страницы Ogg, чистые кадры MP3
+    stitcher = get_stitcher(format_type, int(SAMPLE_RATE))
+    upload = StreamingUpload(file_key, format_type, reserve_header=stitcher.needs_header)
+
+    def on_chunk(index, audio):
+        upload.write_all(stitcher.feed(audio))
+        if on_progress:
+            on_progress(index + 1, len(text_chunks))
+
+    try:
+        _, segments_reused = synthesize_segments(
+            text_chunks, synthesis_params, api_key, format_type, on_chunk=on_chunk, on_segment=on_segment
+        )
+        upload.write_all(stitcher.finish())
+        upload.complete(header=stitcher.header(upload.size))
+    except Exception:
+        upload.abort()
+        raise
+
+    cdn_url = get_cdn_url(file_key)
+
+    # Длительность берётся из заголовков аудио; оценка по словам — только если разбор не удался
+    audio_duration = int(round(stitcher.duration)) or estimate_duration(text, speed)
+
+    try:
+        store_cached_synthesis(cache_key, cdn_url, voice, speed, format_type, len(text), audio_duration)
+    except Exception as cache_error:
+        print(f'Cache store error: {cache_error}')
+
+    return {
+        'audio_url': cdn_url,
+        'audio_duration': audio_duration,
+        'cached': False,
+        'coalesced': False,
+        'segments': {
+            'total': len(text_chunks),
+            'reused': segments_reused,
+            'reuse_ratio': round(segments_reused / len(text_chunks), 3)
+        }
+    }
@@ -0,0 +1,117 @@
+"""Модуль памяти переводов: готовые переводы абзацев в памяти экземпляра и в БД"""
+import hashlib
+import json
+import re
+from psycopg2.extras import execute_values
+from db import get_pooled_connection, release_connection
+from lru import LRUCache
+
+# Размер кэша в памяти тёплого экземпляра функции
+LRU_MAX_SIZE = 2048
+
+# Абзацы разделяются пустой строкой; разделитель сохраняется как есть
+PARAGRAPH_SEPARATOR = re.compile(r'(\s*\n\s*\n\s*)')
+
+_memory_lru = LRUCache(LRU_MAX_SIZE)
+
+
+def split_paragraphs(text: str) -> tuple:
+    """
+    Делит текст на абзацы. Возвращает (paragraphs, separators):
+    separators[i] стоит между paragraphs[i] и paragraphs[i + 1].
+    """
+    parts = PARAGRAPH_SEPARATOR.split(text)
+    return parts[0::2], parts[1::2]
+
+
+def join_paragraphs(paragraphs: list, separators: list) -> str:
+    """Собирает переведённые абзацы обратно с исходными разделителями"""
+    parts = [paragraphs[0]]
+    for separator, paragraph in zip(separators, paragraphs[1:]):
+        parts.append(separator)
+        parts.append(paragraph)
+    return ''.join(parts)
+
+
+def glossary_version(glossary_pairs: list) -> str:
+    """Версия глоссария для ключа памяти: изменение терминов не отдаёт старые переводы"""
+    if not glossary_pairs:
+        return ''
+    payload = json.dumps(glossary_pairs, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def memory_key(text: str, source_language: str, target_language: str, is_technical: bool, glossary: str) -> str:
+    """Ключ памяти переводов: хэш абзаца, языковой пары, режима и версии глоссария"""
+    text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    payload = json.dumps(
+        [text_hash, source_language, target_language, bool(is_technical), glossary],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def lookup_translations(keys: list) -> dict:
+    """Возвращает {key: (translated_text, detected_language)} сначала из памяти, затем из БД"""
+    found = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        cached = _memory_lru.get(key)
+        if cached:
+            found[key] = cached
+        else:
+            missing.append(key)
+
+    if not missing:
+        return found
+
+    conn = get_pooled_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            UPDATE translation_memory
+            SET hits = hits + 1, last_hit_at = NOW()
+            WHERE cache_key = ANY(%s)
+            RETURNING cache_key, translated_text, detected_language
+        """, (missing,))
+
+        rows = cur.fetchall()
+        conn.commit()
+    finally:
+        cur.close()
+        release_connection(conn)
+
+    for row in rows:
+        entry = (row[1], row[2])
+        found[row[0].strip()] = entry
+        _memory_lru.put(row[0].strip(), entry)
+
+    return found
+
+
+def store_translations(entries: list):
+    """
+    Сохраняет новые переводы: список кортежей
+    (key, source_language, target_language, is_technical, translated_text, detected_language)
+    """
+    if not entries:
+        return
+
+    for entry in entries:
+        _memory_lru.put(entry[0], (entry[4], entry[5]))
+
+    conn = get_pooled_connection()
+    cur = conn.cursor()
+
+    try:
+        execute_values(cur, """
+            INSERT INTO translation_memory
+                (cache_key, source_language, target_language, technical, translated_text, detected_language)
+            VALUES %s
+            ON CONFLICT (cache_key) DO NOTHING
+        """, list({entry[0]: entry for entry in entries}.values()))
+        conn.commit()
+    finally:
+        cur.close()
+        release_connection(conn)
@@ -0,0 +1,137 @@
+"""Модуль перевода документов: деление на сегменты, память переводов и перевод новых сегментов"""
+import time
+from circuit_breaker import CircuitOpenError
+from parallel import ordered_map
+from rate_limit import RateLimitExceeded
+from splitter import split_text
+from translation_memory import (
+    split_paragraphs, join_paragraphs, memory_key, lookup_translations, store_translations
+)
+from yandex_translate import translate_texts, detect_language, TranslateError
+
+# Абзац длиннее режется по предложениям: сегмент — единица памяти переводов и пачек
+SEGMENT_MAX_CHARS = 2000
+
+# Сколько языков можно запросить за один вызов
+MAX_TARGET_LANGUAGES = 10
+
+
+def split_document(text: str, max_chars: int = SEGMENT_MAX_CHARS) -> tuple:
+    """
+    Делит текст на сегменты: абзацы, а длинные абзацы — на группы предложений.
+    Возвращает (segments, separators) с исходными пробелами и переводами строк,
+    так что join_paragraphs(segments, separators) восстанавливает текст.
+    """
+    paragraphs, paragraph_separators = split_paragraphs(text)
+    segments = []
+    separators = []
+
+    for number, paragraph in enumerate(paragraphs):
+        if number:
+            separators.append(paragraph_separators[number - 1])
+
+        pieces = split_text(paragraph, max_chars=max_chars) if len(paragraph) > max_chars else [paragraph]
+        position = 0
+        for index, piece in enumerate(pieces):
+            start = paragraph.find(piece, position)
+            if index:
+                separators.append(paragraph[position:start])
+            segments.append(piece)
+            position = start + len(piece)
+
+    return segments, separators
+
+
+def translate_document(text: str, target_language: str, source_language: str, api_key: str,
+                       glossary=None, terms: set = None) -> dict:
+    """
+    Переводит документ любой длины. Сегменты из памяти переводов не уходят в API,
+    новые переводятся пачками параллельно и сохраняются в память.
+    glossary — глоссарий технического режима (None — обычный перевод),
+    terms — найденные в документе термины глоссария, общие для всех языков.
+    Возвращает {translated_text, detected_language, memory_hits, memory_misses}.
+    """
+    technical = glossary is not None
+    version = glossary.language_version(target_language) if technical else ''
+
+    segments, separators = split_document(text)
+    keys = [
+        memory_key(segment, source_language, target_language, technical, version) if segment.strip() else None
+        for segment in segments
+    ]
+
+    try:
+        remembered = lookup_translations([key for key in keys if key])
+    except Exception as db_error:
+        print(f'Translation memory error: {db_error}')
+        remembered = {}
+
+    new_segments = {}
+    for key, segment in zip(keys, segments):
+        if key and key not in remembered:
+            new_segments.setdefault(key, segment)
+
+    if new_segments:
+        translations = translate_texts(list(new_segments.values()), target_language, source_language, api_key,
+                                       glossary, terms)
+
+        new_entries = []
+        for key, (translated, detected) in zip(new_segments, translations):
+            remembered[key] = (translated, detected)
+            new_entries.append((key, source_language, target_language, bool(technical), translated, detected))
+
+        try:
+            store_translations(new_entries)
+        except Exception as db_error:
+            print(f'Translation memory error: {db_error}')
+
+    translated_segments = [remembered[key][0] if key else segment for key, segment in zip(keys, segments)]
+
+    return {
+        'translated_text': join_paragraphs(translated_segments, separators),
+        'detected_language': next((remembered[key][1] for key in keys if key and remembered[key][1]), source_language),
+        'memory_hits': sum(1 for key in keys if key and key not in new_segments),
+        'memory_misses': sum(1 for key in keys if key and key in new_segments)
+    }
+
+
+def translate_to_many(text: str, target_languages: list, source_language: str, api_key: str,
+                      glossary=None) -> dict:
+    """
+    Переводит документ сразу на несколько языков. Язык источника определяется
+    один раз, термины глоссария ищутся один раз, языки переводятся параллельно.
+    Ошибка одного языка не прерывает остальные.
+    Возвращает {detected_language, translations: {язык: результат}}.
+    """
+    if source_language == 'auto':
+        try:
+            source_language = detect_language(text, api_key) or 'auto'
+        except Exception as detect_error:
+            # Без определения каждый язык определит источник сам
+            print(f'Language detection error: {detect_error}')
+
+    terms = glossary.find_terms(text) if glossary else None
+
+    def translate_one(target_language):
+        started = time.monotonic()
+        try:
+            result = translate_document(text, target_language, source_language, api_key, glossary, terms)
+            result['status'] = 200
+        except RateLimitExceeded as e:
+            result = {'status': 429, 'error': str(e), 'retry_after': max(1, round(e.retry_after))}
+        except CircuitOpenError as e:
+            result = {'status': 503, 'error': str(e), 'retry_after': e.retry_after}
+        except TranslateError as e:
+            result = {'status': e.status_code, 'error': f'Ошибка Yandex Translate API: {e.message}'}
+        except Exception as e:
+            print(f'Translation to {target_language} error: {e}')
+            result = {'status': 500, 'error': f'Внутренняя ошибка: {str(e)}'}
+        result['elapsed_ms'] = int((time.monotonic() - started) * 1000)
+        return result
+
+    results = ordered_map(translate_one, target_languages, len(target_languages))
+
+    return {
+        'detected_language': source_language,
+        'translations': dict(zip(target_languages, results))
+    }
@@ -0,0 +1,155 @@
+"""Модуль для учёта генераций: проекты и статистика"""
+from psycopg2.extras import execute_values
+from db import get_db_connection
+
+# Повтор того же запроса (двойной клик, ретрай фронтенда) за это время не создаёт второй проект
+DUPLICATE_WINDOW_SECONDS = 60
+
+# Проект и статистика одним запросом; символы списываются заранее, в quota.reserve_characters.
+# CTE видят снимок до вставки, поэтому existing находит только ранее сохранённый проект
+RECORD_GENERATION_SQL = """
+    WITH existing AS (
+        SELECT id
+        FROM projects
+        WHERE user_id = %(user_id)s AND audio_url = %(audio_url)s
+          AND created_at > NOW() - %(window)s * INTERVAL '1 second'
+        ORDER BY id DESC
+        LIMIT 1
+    ),
+    project AS (
+        INSERT INTO projects (user_id, name, text, audio_url, voice_id, voice_name, speed, pitch, format, character_count, duration, status,
+                              source_text, source_language, target_language)
+        SELECT %(user_id)s, %(name)s, %(text)s, %(audio_url)s, %(voice)s, %(voice)s, %(speed)s, 1.0, %(format)s, %(chars)s, %(duration)s, 'completed',
+               %(source_text)s, %(source_language)s, %(target_language)s
+        WHERE NOT EXISTS (SELECT 1 FROM existing)
+        RETURNING id
+    ),
+    stats AS (
+        INSERT INTO user_stats (user_id, total_generations, total_characters, total_projects, total_audio_duration)
+        SELECT %(user_id)s, 1, %(chars)s, 1, %(duration)s
+        FROM project
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_generations = user_stats.total_generations + 1,
+            total_characters = user_stats.total_characters + EXCLUDED.total_characters,
+            total_projects = user_stats.total_projects + 1,
+            total_audio_duration = user_stats.total_audio_duration + EXCLUDED.total_audio_duration
+        RETURNING user_id
+    )
+    SELECT COALESCE(project.id, existing.id), project.id IS NULL
+    FROM (SELECT 1) AS one
+    LEFT JOIN project ON TRUE
+    LEFT JOIN existing ON TRUE
+"""
+
+
+def build_project_name(text: str) -> str:
+    """Генерирует название проекта из первых слов текста"""
+    words = text.split()
+    return ' '.join(words[:5]) + ('...' if len(words) > 5 else '')
+
+
+def record_generation(user_id, text: str, audio_url: str, voice: str, speed, format_type: str,
+                      audio_duration: int, conn=None, source_text: str = None, source_language: str = None,
+                      target_language: str = None, character_count: int = None) -> dict:
+    """
+    Сохраняет проект и обновляет статистику пользователя одним запросом.
+    Если такой же проект только что сохранён, возвращает его с duplicate=True.
+    Для озвученного перевода сохраняется и исходный текст с парой языков;
+    character_count задаёт учтённые символы, если они считаются не по text.
+    Можно передать уже открытое подключение.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        # Одновременные повторы записываются по очереди, чтобы второй увидел проект первого
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f'project:{user_id}:{audio_url}',))
+        cur.execute(RECORD_GENERATION_SQL, {
+            'user_id': user_id,
+            'name': build_project_name(text),
+            'text': text,
+            'audio_url': audio_url,
+            'voice': voice,
+            'speed': speed,
+            'format': format_type,
+            'chars': len(text) if character_count is None else character_count,
+            'duration': audio_duration,
+            'window': DUPLICATE_WINDOW_SECONDS,
+            'source_text': source_text,
+            'source_language': source_language,
+            'target_language': target_language
+        })
+        row = cur.fetchone()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if own_conn:
+            conn.close()
+
+    return {
+        'project_id': row[0],
+        'duplicate': row[1]
+    }
+
+
+# Все проекты пакета одной многострочной вставкой; статистика обновляется суммой по ним.
+# Идентификаторы выдаются по порядку строк VALUES, и ORDER BY id возвращает их в порядке пакета
+RECORD_BATCH_SQL = """
+    WITH project AS (
+        INSERT INTO projects (user_id, name, text, audio_url, voice_id, voice_name, speed, pitch, format, character_count, duration, status)
+        VALUES %s
+        RETURNING id, user_id, character_count, duration
+    ),
+    stats AS (
+        INSERT INTO user_stats (user_id, total_generations, total_characters, total_projects, total_audio_duration)
+        SELECT user_id, COUNT(*), SUM(character_count), COUNT(*), COALESCE(SUM(duration), 0)
+        FROM project
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_generations = user_stats.total_generations + EXCLUDED.total_generations,
+            total_characters = user_stats.total_characters + EXCLUDED.total_characters,
+            total_projects = user_stats.total_projects + EXCLUDED.total_projects,
+            total_audio_duration = user_stats.total_audio_duration + EXCLUDED.total_audio_duration
+        RETURNING user_id
+    )
+    SELECT id FROM project ORDER BY id
+"""
+
+
+def record_generations(user_id, generations: list, conn=None) -> list:
+    """
+    Сохраняет проекты пакетного синтеза одним запросом.
+    generations — словари с ключами text, audio_url, voice, speed, format, audio_duration.
+    Возвращает идентификаторы проектов в том же порядке.
+    """
+    if not generations:
+        return []
+
+    rows = [
+        (user_id, build_project_name(item['text']), item['text'], item['audio_url'], item['voice'], item['voice'],
+         item['speed'], 1.0, item['format'], len(item['text']), item['audio_duration'], 'completed')
+        for item in generations
+    ]
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        result = execute_values(cur, RECORD_BATCH_SQL, rows, page_size=len(rows), fetch=True)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        if own_conn:
+            conn.close()
+
+    return [row[0] for row in result]
@@ -0,0 +1,62 @@
+"""Модуль для подключения к базе данных"""
+import os
+import threading
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+# Соединений в пуле тёплого экземпляра: хватает на параллельные фрагменты и пакетный синтез
+POOL_MAX_CONNECTIONS = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(POOL_MAX_CONNECTIONS)
+
+
+def get_dsn() -> str:
+    """Возвращает строку подключения с учётом схемы MAIN_DB_SCHEMA"""
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        raise Exception('DATABASE_URL не настроен')
+
+    schema_name = os.environ.get('MAIN_DB_SCHEMA', 'public')
+    return f"{dsn} options='-c search_path={schema_name}'"
+
+
+def get_db_connection():
+    """Создает подключение к базе данных с учётом схемы MAIN_DB_SCHEMA"""
+    return psycopg2.connect(get_dsn())
+
+
+def get_pooled_connection():
+    """
+    Берёт соединение из пула, переиспользуемого между вызовами и потоками.
+    Если свободных соединений нет, ждёт, пока другое не вернут через release_connection.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(0, POOL_MAX_CONNECTIONS, get_dsn())
+
+    _pool_slots.acquire()
+    try:
+        return _pool.getconn()
+    except Exception:
+        _pool_slots.release()
+        raise
+
+
+def release_connection(conn):
+    """Возвращает соединение в пул; незавершённая транзакция откатывается"""
+    try:
+        if conn.closed:
+            _pool.putconn(conn, close=True)
+            return
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            _pool.putconn(conn, close=True)
+            return
+        _pool.putconn(conn)
+    finally:
+        _pool_slots.release()
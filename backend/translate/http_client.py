@@ -0,0 +1,124 @@
+"""Модуль HTTP-клиента с пулом keep-alive соединений и повторами для внешних API"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+# Таймауты (подключение, чтение) в секундах
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DEFAULT_RETRIES = 2
+BACKOFF_BASE = 0.3
+BACKOFF_MAX = 5.0
+
+# Размер пула соединений для каждого хоста
+POOL_SIZES = {
+    'tts.api.cloud.yandex.net': 16,
+    'translate.api.cloud.yandex.net': 16,
+    'api.yookassa.ru': 4
+}
+DEFAULT_POOL_SIZE = 4
+
+_session = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'requests': 0, 'retries': 0}
+
+
+def get_session() -> requests.Session:
+    """Возвращает сессию, переиспользуемую между вызовами тёплого экземпляра"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=DEFAULT_POOL_SIZE))
+                for host, size in POOL_SIZES.items():
+                    session.mount(f'https://{host}/', HTTPAdapter(pool_connections=1, pool_maxsize=size))
+                _session = session
+    return _session
+
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _retry_delay(response, attempt: int) -> float:
+    """
+    Пауза перед повтором: Retry-After, если он есть, иначе экспонента с джиттером.
+    None, если сервер просит ждать дольше BACKOFF_MAX: повтор раньше срока бесполезен.
+    """
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            delay = max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                delay = max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return delay if delay <= BACKOFF_MAX else None
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def request(method: str, url: str, timeout=DEFAULT_TIMEOUT, retries: int = DEFAULT_RETRIES, **kwargs) -> requests.Response:
+    """
+    Выполняет запрос через общий пул соединений.
+    Ответы 429/5xx и сетевые ошибки повторяются до retries раз;
+    ответ с Retry-After больше BACKOFF_MAX возвращается сразу, без повтора.
+    """
+    session = get_session()
+    for attempt in range(retries + 1):
+        _count('requests')
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            _count('retries')
+            time.sleep(_retry_delay(None, attempt))
+            continue
+
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            delay = _retry_delay(response, attempt)
+            if delay is not None:
+                _count('retries')
+                time.sleep(delay)
+                continue
+
+        return response
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request('POST', url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+
+def get_stats() -> dict:
+    """Счётчики запросов, повторов и переиспользования соединений"""
+    opened = 0
+    served = 0
+    if _session is not None:
+        for adapter in _session.adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+                    served += pool.num_requests
+
+    with _stats_lock:
+        stats = dict(_stats)
+
+    stats['connections_opened'] = opened
+    stats['connections_reused'] = max(0, served - opened)
+    return stats
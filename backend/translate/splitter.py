@@ -0,0 +1,208 @@
+"""Модуль для разбиения текста на фрагменты для SpeechKit"""
+import math
+import re
+import time
+import zlib
+
+# Сила границы: чем меньше, тем естественнее пауза в речи
+RANK_SENTENCE = 0
+RANK_CLAUSE = 1
+RANK_COMMA = 2
+RANK_SPACE = 3
+
+SENTENCE_END = '.!?…'
+CLAUSE_END = ';:'
+CLOSING = '"\'»)]”'
+DASHES = '—–'
+
+# Сокращения, после точки в которых предложение не заканчивается
+ABBREVIATIONS = {
+    'т.е', 'т.д', 'т.п', 'т.к', 'т.н', 'т.ч', 'и.о', 'н.э', 'до н.э',
+    'г', 'гг', 'в', 'вв', 'ул', 'пр', 'д', 'кв', 'им', 'см', 'ср', 'др', 'стр', 'рис', 'табл',
+    'тыс', 'млн', 'млрд', 'руб', 'коп', 'шт', 'мин', 'сек', 'проф', 'акад', 'доц', 'св', 'ст',
+    'e.g', 'i.e', 'mr', 'mrs', 'ms', 'dr', 'vs', 'st'
+}
+
+_WHITESPACE = re.compile(r'\s+')
+_WORD_BEFORE_DOT = re.compile(r'(\w+(?:\.\w+)*)\.$')
+
+# Сколько символов перед точкой смотреть при проверке сокращения
+ABBREVIATION_LOOKBACK = 12
+
+
+def _is_abbreviation(text: str, dot: int) -> bool:
+    """Проверяет, что точка в позиции dot завершает сокращение или инициал"""
+    match = _WORD_BEFORE_DOT.search(text, max(0, dot - ABBREVIATION_LOOKBACK), dot + 1)
+    if not match:
+        return False
+    word = match.group(1)
+    if len(word) == 1 and word.isupper():
+        return True
+    return word.lower() in ABBREVIATIONS
+
+
+def _boundary_rank(text: str, start: int, end: int) -> int:
+    """Определяет силу границы по пробельному промежутку text[start:end]"""
+    if '\n' in text[start:end]:
+        return RANK_SENTENCE
+
+    pos = start - 1
+    while pos > 0 and text[pos] in CLOSING:
+        pos -= 1
+    prev = text[pos]
+    following = text[end] if end < len(text) else ''
+
+    if prev in SENTENCE_END:
+        # После сокращения или перед строчной буквой предложение продолжается
+        if prev == '.' and (following.islower() or _is_abbreviation(text, pos)):
+            return RANK_SPACE
+        return RANK_SENTENCE
+    if prev in CLAUSE_END or following in DASHES:
+        return RANK_CLAUSE
+    if prev == ',':
+        return RANK_COMMA
+    return RANK_SPACE
+
+
+def find_boundaries(text: str) -> list:
+    """Возвращает границы (начало пробелов, конец пробелов, сила) за один проход по тексту"""
+    return [
+        (m.start(), m.end(), _boundary_rank(text, m.start(), m.end()))
+        for m in _WHITESPACE.finditer(text)
+    ]
+
+
+# Сколько последних фрагментов выравнивается по длине; остальные границы не зависят от хвоста текста
+BALANCED_TAIL_CHUNKS = 2
+
+# Опорные границы делят текст на блоки, которые упаковываются во фрагменты независимо.
+# Опорность конца предложения зависит только от самого предложения, поэтому правка
+# меняет фрагменты своего блока, а остальные фрагменты совпадают с прежними.
+# Блок закрывается не раньше MIN_BLOCK_SHARE * max_chars, дальше — в среднем
+# через ANCHOR_SHARE * max_chars, чтобы фрагменты не дробились
+ANCHOR_SHARE = 0.6
+MIN_BLOCK_SHARE = 0.5
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+
+def _best_boundary(boundaries: list, index: int, low: float, high: float, ideal: float = None):
+    """
+    Выбирает самую сильную границу с началом в [low, high]: без ideal — самую позднюю,
+    с ideal — ближайшую к нему. Возвращает (граница, индекс первой границы не раньше low).
+    """
+    while index < len(boundaries) and boundaries[index][0] < low:
+        index += 1
+
+    best = None
+    best_key = None
+    candidate = index
+    while candidate < len(boundaries) and boundaries[candidate][0] <= high:
+        ws_start, ws_end, rank = boundaries[candidate]
+        key = (rank, -ws_start if ideal is None else abs(ws_start - ideal))
+        if best_key is None or key < best_key:
+            best, best_key = boundaries[candidate], key
+        candidate += 1
+
+    return best, index
+
+
+def _is_anchor(sentence: str, anchor_chars: float) -> bool:
+    """
+    Решает по хэшу предложения, закрывает ли его конец блок. Вероятность
+    пропорциональна длине предложения, так что блоки в среднем длиной anchor_chars.
+    """
+    return zlib.crc32(sentence.encode('utf-8')) < len(sentence) / anchor_chars * 2 ** 32
+
+
+def _pack(text: str, boundaries: list, index: int, start: int, end: int, max_chars: int, chunks: list) -> int:
+    """
+    Упаковывает text[start:end] во фрагменты не длиннее max_chars: жадно,
+    а последние BALANCED_TAIL_CHUNKS фрагмента — с выравниванием по длине.
+    Возвращает индекс первой непросмотренной границы.
+    """
+    while end - start > max_chars:
+        remaining = end - start
+        high = start + max_chars
+        if remaining > BALANCED_TAIL_CHUNKS * max_chars:
+            best, index = _best_boundary(boundaries, index, start + max_chars / 2, high)
+        else:
+            target = remaining / math.ceil(remaining / max_chars)
+            best, index = _best_boundary(boundaries, index, start + target / 2, high, ideal=start + target)
+
+        if best:
+            chunks.append(text[start:best[0]])
+            start = best[1]
+        else:
+            chunks.append(text[start:high])
+            start = high
+            while index < len(boundaries) and boundaries[index][0] < start:
+                index += 1
+            if index < len(boundaries) and boundaries[index][0] == start:
+                start = boundaries[index][1]
+
+    chunks.append(text[start:end])
+    return index
+
+
+def split_text(text: str, max_chars: int = 500) -> list:
+    """
+    Разбивает текст на фрагменты не длиннее max_chars за линейное время.
+    Предпочитает конец предложения, затем знаки ;: и тире, запятую и пробел;
+    слово длиннее лимита режется принудительно.
+    Текст сначала делится на блоки по абзацам и опорным концам предложений
+    (см. ANCHOR_SHARE), блоки упаковываются во фрагменты независимо: правка
+    меняет только фрагменты своего блока, и кэш фрагментов переиспользует остальные.
+    """
+    text = text.strip()
+    if not text:
+        return []
+
+    boundaries = find_boundaries(text)
+    anchor_chars = max_chars * ANCHOR_SHARE
+    min_block = max_chars * MIN_BLOCK_SHARE
+    chunks = []
+    block_start = 0
+    sentence_start = 0
+    index = 0
+
+    for ws_start, ws_end, rank in boundaries:
+        if rank != RANK_SENTENCE:
+            continue
+        sentence = text[sentence_start:ws_start]
+        sentence_start = ws_end
+        if _PARAGRAPH_BREAK.search(text, ws_start, ws_end) or (
+                ws_start - block_start >= min_block and _is_anchor(sentence, anchor_chars)):
+            index = _pack(text, boundaries, index, block_start, ws_start, max_chars, chunks)
+            block_start = ws_end
+
+    _pack(text, boundaries, index, block_start, len(text), max_chars, chunks)
+    return chunks
+
+
+def benchmark(size: int = 100_000, max_chars: int = 500, repeats: int = 5):
+    """Замеряет split_text на длинных текстах разной структуры: python splitter.py"""
+    prose = (
+        'Перед началом работ проводится инструктаж, т.е. работник знакомится с правилами. '
+        'Руководитель участка, напр. мастер смены, проверяет средства защиты; без них допуск запрещён! '
+        'Что делать при аварии? Остановить оборудование — и сообщить диспетчеру по тел. 112… '
+    )
+    samples = [
+        ('проза', prose),
+        ('без знаков', 'слово '),
+        ('одно слово', 'а')
+    ]
+
+    for name, sample in samples:
+        text = (sample * (size // len(sample) + 1))[:size]
+        best = None
+        for _ in range(repeats):
+            started = time.perf_counter()
+            chunks = split_text(text, max_chars=max_chars)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f'{name:>10}: {len(text)} символов, {best * 1000:7.1f} мс, фрагментов {len(chunks)}, '
+              f'самый длинный {max(len(chunk) for chunk in chunks)}')
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,142 @@
+"""Модуль для перевода через Yandex Translate"""
+import math
+import os
+import http_client
+import circuit_breaker
+from parallel import ordered_map
+from rate_limit import acquire
+
+TRANSLATE_URL = 'https://translate.api.cloud.yandex.net/translate/v2/translate'
+DETECT_URL = 'https://translate.api.cloud.yandex.net/translate/v2/detect'
+
+# API принимает до 10000 символов во всех texts одного запроса
+BATCH_MAX_CHARS = 9000
+
+# Для определения языка достаточно начала текста
+DETECT_SAMPLE_CHARS = 1000
+
+# Количество одновременных запросов к Yandex Translate в рамках одного вызова
+DEFAULT_MAX_WORKERS = 4
+
+
+class TranslateError(Exception):
+    """Ошибка ответа Yandex Translate"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def get_max_workers() -> int:
+    """Возвращает число параллельных запросов из TRANSLATE_MAX_WORKERS"""
+    try:
+        return max(1, int(os.environ.get('TRANSLATE_MAX_WORKERS', DEFAULT_MAX_WORKERS)))
+    except ValueError:
+        return DEFAULT_MAX_WORKERS
+
+
+def pack_batches(texts: list, max_chars: int = BATCH_MAX_CHARS) -> list:
+    """
+    Раскладывает тексты по порядку в пачки не длиннее max_chars.
+    Пачки выравниваются по объёму, чтобы параллельные запросы завершались одновременно.
+    """
+    total = sum(len(text) for text in texts)
+    target = total / max(1, math.ceil(total / max_chars))
+
+    batches = []
+    batch = []
+    size = 0
+    for text in texts:
+        if batch and (size + len(text) > max_chars or size >= target):
+            batches.append(batch)
+            batch = []
+            size = 0
+        batch.append(text)
+        size += len(text)
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _post(url: str, payload: dict, api_key: str):
+    # Разомкнутый выключатель отказывает до ожидания токена и запроса к БД лимитов
+    circuit_breaker.check('translate')
+
+    # Общий для всех экземпляров лимит частоты запросов к Yandex Translate
+    acquire('translate')
+
+    # Пока Yandex Translate деградирует, запросы отклоняются сразу, не дожидаясь таймаутов
+    response = circuit_breaker.call(
+        'translate',
+        lambda: http_client.post(
+            url,
+            headers={
+                'Authorization': f'Api-Key {api_key}',
+                'Content-Type': 'application/json'
+            },
+            json=payload,
+            timeout=(3.05, 30)
+        ),
+        is_failure=lambda result: result.status_code in http_client.RETRY_STATUSES
+    )
+
+    if response.status_code != 200:
+        raise TranslateError(response.status_code, response.text)
+    return response.json()
+
+
+def detect_language(text: str, api_key: str) -> str:
+    """Определяет язык текста по его началу; None, если язык не определён"""
+    result = _post(DETECT_URL, {'text': text[:DETECT_SAMPLE_CHARS]}, api_key)
+    return result.get('languageCode') or None
+
+
+def translate_batch(texts: list, target_language: str, source_language: str, api_key: str,
+                    glossary=None, terms: set = None) -> list:
+    """
+    Переводит пачку текстов одним запросом; возвращает [(перевод, определённый язык)].
+    glossary — глоссарий технического режима, terms — термины глоссария,
+    уже найденные в документе, чтобы не искать их заново.
+    """
+    payload = {
+        'texts': texts,
+        'targetLanguageCode': target_language,
+        'format': 'PLAIN_TEXT'
+    }
+
+    if source_language != 'auto':
+        payload['sourceLanguageCode'] = source_language
+
+    # В технический режим уходят только термины глоссария, которые есть в тексте
+    glossary_pairs = glossary.match('\n'.join(texts), target_language, terms) if glossary else []
+    if glossary_pairs:
+        payload['glossaryConfig'] = {
+            'glossaryData': {
+                'glossaryPairs': glossary_pairs
+            }
+        }
+
+    translations = _post(TRANSLATE_URL, payload, api_key).get('translations') or []
+    if len(translations) != len(texts):
+        raise TranslateError(500, 'Не удалось получить перевод')
+
+    return [
+        (translation['text'], translation.get('detectedLanguageCode', source_language))
+        for translation in translations
+    ]
+
+
+def translate_texts(texts: list, target_language: str, source_language: str, api_key: str,
+                    glossary=None, terms: set = None, max_workers: int = None) -> list:
+    """
+    Переводит тексты пачками параллельно, сохраняя их порядок.
+    Первая ошибка отменяет ещё не начатые пачки.
+    """
+    batches = ordered_map(
+        lambda batch: translate_batch(batch, target_language, source_language, api_key, glossary, terms),
+        pack_batches(texts),
+        max_workers or get_max_workers()
+    )
+    return [translation for batch in batches for translation in batch]
@@ -69,9 +69,12 @@ def handler(event: dict, context) -> dict:
         
         # Получаем информацию о пользователе и его использовании
         cur.execute("""
-            SELECT plan, characters_used, avatar_url, usage_reset_date
-            FROM users
-            WHERE id = %s
+            SELECT u.plan, u.characters_used, u.avatar_url, u.usage_reset_date,
+                   COALESCE(p.character_limit, free.character_limit)
+            FROM users u
+            LEFT JOIN plans p ON p.code = CASE WHEN u.role = 'admin' THEN 'unlimited' ELSE COALESCE(u.plan, 'free') END
+            LEFT JOIN plans free ON free.code = 'free'
+            WHERE u.id = %s
         """, (int(user_id),))
         
         user_row = cur.fetchone()
@@ -81,11 +84,13 @@ def handler(event: dict, context) -> dict:
             user_plan = 'free'
             characters_used = 0
             avatar_url = None
+            character_limit = None
         else:
             user_plan = user_row[0] if user_row[0] else 'free'
             characters_used = user_row[1] if user_row[1] else 0
             avatar_url = user_row[2]
             last_reset = user_row[3]
+            character_limit = user_row[4]
             
             # Проверяем, нужно ли сбросить счетчик (если начался новый месяц)
             from datetime import datetime
@@ -122,15 +127,10 @@ def handler(event: dict, context) -> dict:
             stats_row = cur.fetchone()
             conn.commit()
         
-        # Лимиты по тарифам
-        plan_limits = {
-            'free': 5000,
-            'basic': 50000,
-            'pro': 300000,
-            'unlimited': -1  # -1 означает безлимит
-        }
+        # Лимиты по тарифам берутся из таблицы plans, -1 означает безлимит
+        if character_limit is None:
+            character_limit = 5000
         
-        character_limit = plan_limits.get(user_plan, 5000)
         characters_remaining = character_limit - characters_used if character_limit > 0 else -1
         
         stats = {
@@ -0,0 +1,13 @@
+-- Кэш синтеза речи: ключ — хэш текста, голоса, скорости, формата и частоты дискретизации
+CREATE TABLE IF NOT EXISTS tts_cache (
+    cache_key CHAR(64) PRIMARY KEY,
+    audio_url TEXT NOT NULL,
+    voice VARCHAR(100) NOT NULL,
+    speed DECIMAL(3,1) NOT NULL,
+    format VARCHAR(10) NOT NULL,
+    character_count INTEGER NOT NULL,
+    audio_duration INTEGER DEFAULT 0,
+    hits INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP
+);
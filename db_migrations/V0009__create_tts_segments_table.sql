@@ -0,0 +1,8 @@
+-- Кэш отдельных фрагментов синтеза для повторной озвучки отредактированных текстов
+CREATE TABLE IF NOT EXISTS tts_segments (
+    segment_key CHAR(64) PRIMARY KEY,
+    s3_key TEXT NOT NULL,
+    byte_size INTEGER NOT NULL,
+    hits INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
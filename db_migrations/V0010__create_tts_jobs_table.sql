@@ -0,0 +1,23 @@
+-- Очередь асинхронных заданий синтеза длинных текстов
+CREATE TABLE IF NOT EXISTS tts_jobs (
+    id VARCHAR(36) PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id),
+    text TEXT NOT NULL,
+    voice VARCHAR(100) NOT NULL,
+    speed DECIMAL(3,1) DEFAULT 1.0,
+    format VARCHAR(10) DEFAULT 'mp3',
+    status VARCHAR(20) DEFAULT 'queued' CHECK (status IN ('queued', 'processing', 'completed', 'failed')),
+    segments_total INTEGER DEFAULT 0,
+    segments_done INTEGER DEFAULT 0,
+    audio_url TEXT,
+    audio_duration INTEGER,
+    error TEXT,
+    attempts INTEGER DEFAULT 0,
+    locked_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+-- Индекс для выборки следующего задания воркером
+CREATE INDEX IF NOT EXISTS idx_tts_jobs_queue ON tts_jobs(status, created_at);
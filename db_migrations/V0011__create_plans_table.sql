@@ -0,0 +1,15 @@
+-- Каталог тарифов: лимиты символов задаются в одном месте для всех функций
+CREATE TABLE IF NOT EXISTS plans (
+    code VARCHAR(20) PRIMARY KEY,
+    character_limit INTEGER NOT NULL,
+    max_request_chars INTEGER NOT NULL DEFAULT 5000,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- -1 означает безлимит
+INSERT INTO plans (code, character_limit, max_request_chars) VALUES
+    ('free', 5000, 5000),
+    ('basic', 50000, 5000),
+    ('pro', 300000, 5000),
+    ('unlimited', -1, 8000)
+ON CONFLICT (code) DO NOTHING;
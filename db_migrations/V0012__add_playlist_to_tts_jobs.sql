@@ -0,0 +1,2 @@
+-- Задания с плейлистом: фрагменты доступны для воспроизведения по мере синтеза
+ALTER TABLE tts_jobs ADD COLUMN IF NOT EXISTS playlist BOOLEAN DEFAULT FALSE;
@@ -0,0 +1,14 @@
+-- Общие для всех экземпляров функций лимиты запросов к внешним API (token bucket)
+CREATE TABLE IF NOT EXISTS rate_limits (
+    name VARCHAR(50) PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    capacity DOUBLE PRECISION NOT NULL,
+    refill_per_sec DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- capacity — допустимый всплеск запросов, refill_per_sec — устойчивая частота
+INSERT INTO rate_limits (name, tokens, capacity, refill_per_sec) VALUES
+    ('speechkit', 40, 40, 20),
+    ('translate', 20, 20, 10)
+ON CONFLICT (name) DO NOTHING;
@@ -0,0 +1,13 @@
+-- Состояние автоматических выключателей внешних API, общее для всех экземпляров функций
+CREATE TABLE IF NOT EXISTS circuit_breakers (
+    name VARCHAR(50) PRIMARY KEY,
+    state VARCHAR(20) NOT NULL DEFAULT 'closed' CHECK (state IN ('closed', 'open', 'half_open')),
+    opened_until TIMESTAMP,
+    probe_started_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO circuit_breakers (name, state) VALUES
+    ('speechkit', 'closed'),
+    ('translate', 'closed')
+ON CONFLICT (name) DO NOTHING;
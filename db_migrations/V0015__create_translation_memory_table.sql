@@ -0,0 +1,12 @@
+-- Память переводов: ключ — хэш абзаца, языковой пары, режима и версии глоссария
+CREATE TABLE IF NOT EXISTS translation_memory (
+    cache_key CHAR(64) PRIMARY KEY,
+    source_language VARCHAR(10) NOT NULL,
+    target_language VARCHAR(10) NOT NULL,
+    technical BOOLEAN DEFAULT FALSE,
+    translated_text TEXT NOT NULL,
+    detected_language VARCHAR(10),
+    hits INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP
+);
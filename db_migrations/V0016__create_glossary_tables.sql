@@ -0,0 +1,210 @@
+-- Глоссарии технического перевода: общий (user_id IS NULL) и пользовательские
+CREATE TABLE IF NOT EXISTS glossary_terms (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id),
+    target_language VARCHAR(10) NOT NULL,
+    source_text TEXT NOT NULL,
+    translated_text TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_glossary_terms_unique
+    ON glossary_terms (COALESCE(user_id, 0), target_language, source_text);
+
+-- Счётчик версии на владельца глоссария: 0 — общий глоссарий.
+-- Экземпляры функций сверяют версию одним запросом и перечитывают термины только при её изменении
+CREATE TABLE IF NOT EXISTS glossary_versions (
+    user_id INTEGER PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE OR REPLACE FUNCTION bump_glossary_version() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO glossary_versions (user_id, version)
+    SELECT DISTINCT COALESCE(user_id, 0), 1 FROM changed_terms
+    ON CONFLICT (user_id) DO UPDATE
+    SET version = glossary_versions.version + 1, updated_at = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER glossary_terms_insert_version
+    AFTER INSERT ON glossary_terms
+    REFERENCING NEW TABLE AS changed_terms
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_glossary_version();
+
+CREATE TRIGGER glossary_terms_update_version
+    AFTER UPDATE ON glossary_terms
+    REFERENCING NEW TABLE AS changed_terms
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_glossary_version();
+
+CREATE TRIGGER glossary_terms_delete_version
+    AFTER DELETE ON glossary_terms
+    REFERENCING OLD TABLE AS changed_terms
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_glossary_version();
+
+-- Встроенный глоссарий охраны труда становится общим глоссарием
+INSERT INTO glossary_terms (user_id, target_language, source_text, translated_text) VALUES
+    (NULL, 'en', 'средства индивидуальной защиты', 'personal protective equipment (PPE)'),
+    (NULL, 'en', 'СИЗ', 'PPE'),
+    (NULL, 'en', 'охрана труда', 'occupational safety'),
+    (NULL, 'en', 'техника безопасности', 'safety regulations'),
+    (NULL, 'en', 'производственная инструкция', 'operating instruction'),
+    (NULL, 'en', 'технологический процесс', 'technological process'),
+    (NULL, 'en', 'аварийная остановка', 'emergency stop'),
+    (NULL, 'en', 'предохранительное устройство', 'safety device'),
+    (NULL, 'en', 'защитное заземление', 'protective grounding'),
+    (NULL, 'en', 'огнетушитель', 'fire extinguisher'),
+    (NULL, 'en', 'эвакуационный выход', 'emergency exit'),
+    (NULL, 'en', 'производственная травма', 'occupational injury'),
+    (NULL, 'en', 'вредные производственные факторы', 'occupational hazards'),
+    (NULL, 'en', 'предельно допустимая концентрация', 'maximum allowable concentration (MAC)'),
+    (NULL, 'en', 'ПДК', 'MAC'),
+    (NULL, 'en', 'спецодежда', 'work clothing'),
+    (NULL, 'en', 'респиратор', 'respirator'),
+    (NULL, 'en', 'защитные очки', 'safety goggles'),
+    (NULL, 'en', 'каска', 'hard hat'),
+    (NULL, 'en', 'наряд-допуск', 'work permit'),
+    (NULL, 'en', 'инструктаж по технике безопасности', 'safety briefing'),
+    (NULL, 'en', 'знаки безопасности', 'safety signs'),
+    (NULL, 'en', 'первая помощь', 'first aid'),
+    (NULL, 'en', 'несчастный случай', 'accident'),
+    (NULL, 'en', 'профессиональное заболевание', 'occupational disease'),
+    (NULL, 'en', 'рабочее место', 'workplace'),
+    (NULL, 'en', 'условия труда', 'working conditions'),
+    (NULL, 'en', 'режим труда и отдыха', 'work and rest schedule'),
+    (NULL, 'de', 'средства индивидуальной защиты', 'persönliche Schutzausrüstung (PSA)'),
+    (NULL, 'de', 'СИЗ', 'PSA'),
+    (NULL, 'de', 'охрана труда', 'Arbeitsschutz'),
+    (NULL, 'de', 'техника безопасности', 'Sicherheitsvorschriften'),
+    (NULL, 'de', 'производственная инструкция', 'Betriebsanweisung'),
+    (NULL, 'de', 'технологический процесс', 'technologischer Prozess'),
+    (NULL, 'de', 'аварийная остановка', 'Not-Aus'),
+    (NULL, 'de', 'предохранительное устройство', 'Schutzeinrichtung'),
+    (NULL, 'de', 'защитное заземление', 'Schutzerdung'),
+    (NULL, 'de', 'огнетушитель', 'Feuerlöscher'),
+    (NULL, 'de', 'эвакуационный выход', 'Notausgang'),
+    (NULL, 'de', 'производственная травма', 'Arbeitsunfall'),
+    (NULL, 'de', 'спецодежда', 'Arbeitskleidung'),
+    (NULL, 'de', 'респиратор', 'Atemschutzgerät'),
+    (NULL, 'de', 'защитные очки', 'Schutzbrille'),
+    (NULL, 'de', 'каска', 'Schutzhelm'),
+    (NULL, 'de', 'наряд-допуск', 'Arbeitserlaubnis'),
+    (NULL, 'de', 'первая помощь', 'Erste Hilfe'),
+    (NULL, 'de', 'рабочее место', 'Arbeitsplatz'),
+    (NULL, 'fr', 'средства индивидуальной защиты', 'équipement de protection individuelle (EPI)'),
+    (NULL, 'fr', 'СИЗ', 'EPI'),
+    (NULL, 'fr', 'охрана труда', 'sécurité au travail'),
+    (NULL, 'fr', 'техника безопасности', 'consignes de sécurité'),
+    (NULL, 'fr', 'производственная инструкция', 'instruction de travail'),
+    (NULL, 'fr', 'технологический процесс', 'procédé technologique'),
+    (NULL, 'fr', 'аварийная остановка', 'arrêt d''urgence'),
+    (NULL, 'fr', 'предохранительное устройство', 'dispositif de sécurité'),
+    (NULL, 'fr', 'защитное заземление', 'mise à la terre de protection'),
+    (NULL, 'fr', 'огнетушитель', 'extincteur'),
+    (NULL, 'fr', 'эвакуационный выход', 'sortie de secours'),
+    (NULL, 'fr', 'спецодежда', 'vêtements de travail'),
+    (NULL, 'fr', 'респиратор', 'appareil respiratoire'),
+    (NULL, 'fr', 'защитные очки', 'lunettes de protection'),
+    (NULL, 'fr', 'каска', 'casque de protection'),
+    (NULL, 'fr', 'первая помощь', 'premiers secours'),
+    (NULL, 'es', 'средства индивидуальной защиты', 'equipo de protección individual (EPI)'),
+    (NULL, 'es', 'СИЗ', 'EPI'),
+    (NULL, 'es', 'охрана труда', 'seguridad laboral'),
+    (NULL, 'es', 'техника безопасности', 'normas de seguridad'),
+    (NULL, 'es', 'производственная инструкция', 'instrucción de trabajo'),
+    (NULL, 'es', 'технологический процесс', 'proceso tecnológico'),
+    (NULL, 'es', 'аварийная остановка', 'parada de emergencia'),
+    (NULL, 'es', 'предохранительное устройство', 'dispositivo de seguridad'),
+    (NULL, 'es', 'защитное заземление', 'toma de tierra de protección'),
+    (NULL, 'es', 'огнетушитель', 'extintor'),
+    (NULL, 'es', 'эвакуационный выход', 'salida de emergencia'),
+    (NULL, 'es', 'спецодежда', 'ropa de trabajo'),
+    (NULL, 'es', 'респиратор', 'respirador'),
+    (NULL, 'es', 'защитные очки', 'gafas de seguridad'),
+    (NULL, 'es', 'каска', 'casco de seguridad'),
+    (NULL, 'zh', 'средства индивидуальной защиты', '个人防护装备 (PPE)'),
+    (NULL, 'zh', 'СИЗ', 'PPE'),
+    (NULL, 'zh', 'охрана труда', '劳动保护'),
+    (NULL, 'zh', 'техника безопасности', '安全技术'),
+    (NULL, 'zh', 'производственная инструкция', '生产指令'),
+    (NULL, 'zh', 'технологический процесс', '工艺流程'),
+    (NULL, 'zh', 'аварийная остановка', '紧急停止'),
+    (NULL, 'zh', 'предохранительное устройство', '保护装置'),
+    (NULL, 'zh', 'защитное заземление', '保护接地'),
+    (NULL, 'zh', 'огнетушитель', '灭火器'),
+    (NULL, 'zh', 'эвакуационный выход', '紧急出口'),
+    (NULL, 'zh', 'спецодежда', '工作服'),
+    (NULL, 'zh', 'респиратор', '呼吸器'),
+    (NULL, 'zh', 'защитные очки', '护目镜'),
+    (NULL, 'zh', 'каска', '安全帽'),
+    (NULL, 'ja', 'средства индивидуальной защиты', '個人用保護具 (PPE)'),
+    (NULL, 'ja', 'СИЗ', 'PPE'),
+    (NULL, 'ja', 'охрана труда', '労働安全'),
+    (NULL, 'ja', 'техника безопасности', '安全規則'),
+    (NULL, 'ja', 'производственная инструкция', '作業指示書'),
+    (NULL, 'ja', 'технологический процесс', '技術プロセス'),
+    (NULL, 'ja', 'аварийная остановка', '緊急停止'),
+    (NULL, 'ja', 'огнетушитель', '消火器'),
+    (NULL, 'ja', 'эвакуационный выход', '非常口'),
+    (NULL, 'ja', 'спецодежда', '作業服'),
+    (NULL, 'ja', 'каска', 'ヘルメット'),
+    (NULL, 'ko', 'средства индивидуальной защиты', '개인 보호 장비 (PPE)'),
+    (NULL, 'ko', 'СИЗ', 'PPE'),
+    (NULL, 'ko', 'охрана труда', '산업 안전'),
+    (NULL, 'ko', 'техника безопасности', '안전 규정'),
+    (NULL, 'ko', 'производственная инструкция', '작업 지침'),
+    (NULL, 'ko', 'технологический процесс', '기술 프로세스'),
+    (NULL, 'ko', 'аварийная остановка', '비상 정지'),
+    (NULL, 'ko', 'огнетушитель', '소화기'),
+    (NULL, 'ko', 'эвакуационный выход', '비상구'),
+    (NULL, 'it', 'средства индивидуальной защиты', 'dispositivi di protezione individuale (DPI)'),
+    (NULL, 'it', 'СИЗ', 'DPI'),
+    (NULL, 'it', 'охрана труда', 'sicurezza sul lavoro'),
+    (NULL, 'it', 'техника безопасности', 'norme di sicurezza'),
+    (NULL, 'it', 'производственная инструкция', 'istruzione operativa'),
+    (NULL, 'it', 'технологический процесс', 'processo tecnologico'),
+    (NULL, 'it', 'аварийная остановка', 'arresto di emergenza'),
+    (NULL, 'it', 'огнетушитель', 'estintore'),
+    (NULL, 'it', 'эвакуационный выход', 'uscita di emergenza'),
+    (NULL, 'pt', 'средства индивидуальной защиты', 'equipamento de proteção individual (EPI)'),
+    (NULL, 'pt', 'СИЗ', 'EPI'),
+    (NULL, 'pt', 'охрана труда', 'segurança do trabalho'),
+    (NULL, 'pt', 'техника безопасности', 'normas de segurança'),
+    (NULL, 'pt', 'производственная инструкция', 'instrução de trabalho'),
+    (NULL, 'pt', 'технологический процесс', 'processo tecnológico'),
+    (NULL, 'pt', 'аварийная остановка', 'parada de emergência'),
+    (NULL, 'pt', 'огнетушитель', 'extintor'),
+    (NULL, 'pt', 'эвакуационный выход', 'saída de emergência'),
+    (NULL, 'tr', 'средства индивидуальной защиты', 'kişisel koruyucu ekipman (KKE)'),
+    (NULL, 'tr', 'СИЗ', 'KKE'),
+    (NULL, 'tr', 'охрана труда', 'iş güvenliği'),
+    (NULL, 'tr', 'техника безопасности', 'güvenlik kuralları'),
+    (NULL, 'tr', 'производственная инструкция', 'çalışma talimatı'),
+    (NULL, 'tr', 'аварийная остановка', 'acil durdurma'),
+    (NULL, 'tr', 'огнетушитель', 'yangın söndürücü'),
+    (NULL, 'tr', 'эвакуационный выход', 'acil çıkış'),
+    (NULL, 'pl', 'средства индивидуальной защиты', 'środki ochrony indywidualnej (ŚOI)'),
+    (NULL, 'pl', 'СИЗ', 'ŚOI'),
+    (NULL, 'pl', 'охрана труда', 'bezpieczeństwo pracy'),
+    (NULL, 'pl', 'техника безопасности', 'zasady bezpieczeństwa'),
+    (NULL, 'pl', 'производственная инструкция', 'instrukcja robocza'),
+    (NULL, 'pl', 'аварийная остановка', 'zatrzymanie awaryjne'),
+    (NULL, 'pl', 'огнетушитель', 'gaśnica'),
+    (NULL, 'pl', 'эвакуационный выход', 'wyjście ewakuacyjne'),
+    (NULL, 'ar', 'средства индивидуальной защиты', 'معدات الحماية الشخصية (PPE)'),
+    (NULL, 'ar', 'СИЗ', 'PPE'),
+    (NULL, 'ar', 'охрана труда', 'السلامة المهنية'),
+    (NULL, 'ar', 'техника безопасности', 'لوائح السلامة'),
+    (NULL, 'ar', 'аварийная остановка', 'إيقاف الطوارئ'),
+    (NULL, 'ar', 'огнетушитель', 'طفاية حريق'),
+    (NULL, 'ar', 'эвакуационный выход', 'مخرج الطوارئ'),
+    (NULL, 'kk', 'средства индивидуальной защиты', 'жеке қорғану құралдары (ЖҚҚ)'),
+    (NULL, 'kk', 'СИЗ', 'ЖҚҚ'),
+    (NULL, 'kk', 'охрана труда', 'еңбек қорғау'),
+    (NULL, 'kk', 'техника безопасности', 'қауіпсіздік техникасы'),
+    (NULL, 'kk', 'аварийная остановка', 'авариялық тоқтату'),
+    (NULL, 'kk', 'огнетушитель', 'өрт сөндіргіш'),
+    (NULL, 'kk', 'эвакуационный выход', 'эвакуациялық шығу')
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,4 @@
+-- Проект «перевести и озвучить» хранит исходный текст рядом с переводом
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS source_text TEXT;
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS source_language VARCHAR(10);
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS target_language VARCHAR(10);
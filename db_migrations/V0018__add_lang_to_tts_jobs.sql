@@ -0,0 +1,2 @@
+-- Язык SpeechKit задания: голос jane-en синтезируется как jane с lang=en-US
+ALTER TABLE tts_jobs ADD COLUMN IF NOT EXISTS lang VARCHAR(10);